@@ -12,4 +12,22 @@
 #
 # ##########################################################
 
+from __future__ import absolute_import
+
 __version__ = '1.0.0'
+
+# current window (module state is kept between shelf clicks)
+_window = None
+
+
+# ---------------------------------------------------------
+# show coordinate window (gui is imported on first call)
+# ---------------------------------------------------------
+# @param None
+# @return <coordUI.gui.toolGUI>window : window
+def show():
+    global _window
+    from . import gui
+    _window = gui.toolGUI()
+    _window.show()
+    return _window
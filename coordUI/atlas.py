@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  packed texture atlas of part images
+#  @file   atlas.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+#  [format]\n
+#  header : magic(4s) version(I) index offset(Q) index length(I)\n
+#  data   : ARGB32 premultiplied rows (16 byte aligned)\n
+#  index  : json (utf-8)\n
+#
+# #########################################################
+from __future__ import absolute_import, division, print_function
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+from PySide2 import QtGui
+from PySide2 import QtCore
+
+from . import catalog
+from . import loader
+from . import profiler
+
+
+atlasMagic = b'CATL'
+atlasVersion = 1
+headerFormat = '<4sIQI'
+defAtlasName = 'atlas.bin'
+
+
+# ---------------------------------------------------------
+# align offset
+# ---------------------------------------------------------
+# @param <int>offset : offset
+# @param <int>align  : alignment
+# @return <int>offset : aligned offset
+def alignOffset(offset, align=16):
+    return (offset + align - 1) // align * align
+
+
+# ---------------------------------------------------------
+# build atlas (parts are stacked vertically, one strip per part)
+# ---------------------------------------------------------
+# @param <str>imgDir     : thumbnail directory
+# @param <int/List>wh    : width and height of packed part
+# @param <str>atlasPath  : output path (default : imgDir/atlas.bin)
+# @param <str>thumbName  : thumbnail file name
+# @return <str>atlasPath : atlas path (None if atlas is in use)
+def buildAtlas(imgDir, wh, atlasPath=None, thumbName='[coordID].png'):
+    if atlasPath is None:
+        atlasPath = imgDir + '/' + defAtlasName
+    coordCatalog = catalog.Catalog(imgDir, thumbName)
+    coordCatalog.scan()
+
+    width = max(wh)
+    stride = width * 4
+    dataOffset = alignOffset(struct.calcsize(headerFormat))
+    index = {'size': list(wh), 'width': width, 'stride': stride, 'parts': {}}
+    ypos = 0
+    tmpPath = atlasPath + '.tmp'
+    f = open(tmpPath, 'wb')
+    with f:
+        f.write(b'\0' * dataOffset)
+        # data
+        for coordID in sorted(coordCatalog.pathDict):
+            path = coordCatalog.pathDict[coordID]
+            source = QtGui.QImage(path)
+            if source.isNull():
+                continue
+            image = loader.scaleToFit(source, wh)
+            strip = QtGui.QImage(width, image.height(),
+                                 QtGui.QImage.Format_ARGB32_Premultiplied)
+            strip.fill(QtCore.Qt.transparent)
+            painter = QtGui.QPainter(strip)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+            painter.drawImage(0, 0, image)
+            painter.end()
+            f.write(strip.constBits())
+            index['parts'][coordID] = {
+                'rect': [0, ypos, image.width(), image.height()],
+                'size': [source.width(), source.height()],
+                'category': catalog.getCategory(coordID),
+                'mtime': coordCatalog.getMtime(path)}
+            ypos += image.height()
+        index['height'] = ypos
+        # index
+        indexStr = json.dumps(index, sort_keys=True).encode('utf-8')
+        indexOffset = f.tell()
+        f.write(indexStr)
+        f.seek(0)
+        f.write(struct.pack(headerFormat, atlasMagic, atlasVersion, indexOffset, len(indexStr)))
+    try:
+        if os.path.exists(atlasPath):
+            os.remove(atlasPath)
+        os.rename(tmpPath, atlasPath)
+    except OSError:
+        # mapped by open window (cannot be replaced on Windows)
+        os.remove(tmpPath)
+        return None
+
+    return atlasPath
+
+
+# ---------------------------------------------------------
+# open atlas
+# ---------------------------------------------------------
+# @param <str>atlasPath : atlas path
+# @return <Atlas>atlas : atlas (None if not exist or invalid)
+def openAtlas(atlasPath):
+    if not os.path.isfile(atlasPath):
+        return None
+    try:
+        return Atlas(atlasPath)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------
+# atlas (memory mapped)
+# ---------------------------------------------------------
+class Atlas(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <str>atlasPath : atlas path
+    # @return None
+    def __init__(self, atlasPath):
+        self.path = atlasPath
+        f = open(atlasPath, 'rb')
+        with f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.readIndex()
+        except (ValueError, KeyError, TypeError):
+            # truncated or partly written
+            self.close()
+            raise ValueError('invalid atlas : ' + atlasPath)
+
+    # ---------------------------------------------------------
+    # read header and index
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def readIndex(self):
+        headerSize = struct.calcsize(headerFormat)
+        if len(self.mm) < headerSize:
+            raise ValueError('short header')
+        header = struct.unpack(headerFormat, self.mm[:headerSize])
+        magic, version, indexOffset, indexLen = header
+        if magic != atlasMagic or version != atlasVersion:
+            raise ValueError('unknown format')
+        self.dataOffset = alignOffset(headerSize)
+        if indexOffset < self.dataOffset or indexOffset + indexLen > len(self.mm):
+            raise ValueError('index out of range')
+        indexStr = self.mm[indexOffset:indexOffset + indexLen]
+        self.index = json.loads(indexStr.decode('utf-8'))
+        self.size = self.index['size']
+        self.stride = self.index['stride']
+        self.parts = self.index['parts']
+        if self.dataOffset + self.index['height'] * self.stride > indexOffset:
+            raise ValueError('pixel data out of range')
+
+    # ---------------------------------------------------------
+    # close
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    # ---------------------------------------------------------
+    # check part is packed and up to date
+    # ---------------------------------------------------------
+    # @param <str>coordID  : coordinate ID
+    # @param <int/List>wh  : width and height
+    # @param <float>mtime  : modified time of source (None : not check)
+    # @return <bool> : if available, True
+    def has(self, coordID, wh=None, mtime=None):
+        part = self.parts.get(coordID)
+        if part is None or self.mm is None:
+            return False
+        if wh is not None and list(wh) != self.size:
+            return False
+        if mtime is not None and part['mtime'] != mtime:
+            return False
+        return True
+
+    # ---------------------------------------------------------
+    # slice part image
+    # ---------------------------------------------------------
+    # @param <str>coordID : coordinate ID
+    # @return <QtGui.QImage>image : part image (None if not packed)
+    @profiler.timed('atlas.slice')
+    def getImage(self, coordID):
+        part = self.parts.get(coordID)
+        if part is None or self.mm is None:
+            return None
+        x, y, w, h = part['rect']
+        start = self.dataOffset + y * self.stride
+        if sys.version_info[0] < 3:
+            data = buffer(self.mm, start, h * self.stride)
+        else:
+            data = memoryview(self.mm)[start:start + h * self.stride]
+        strip = QtGui.QImage(data, self.index['width'], h, self.stride,
+                             QtGui.QImage.Format_ARGB32_Premultiplied)
+        # copy detaches image from mapped memory
+        return strip.copy(x, 0, w, h)
+
+
+# ----------------------------------------------------------------------------
+if __name__ == '__main__':
+    # python -m coordUI.atlas <imgDir> [width] [height]
+    if len(sys.argv) > 3:
+        size = [int(sys.argv[2]), int(sys.argv[3])]
+    else:
+        size = [500, 500]
+    atlasPath = buildAtlas(sys.argv[1].replace('\\', '/'), size)
+    if atlasPath is None:
+        print("# build atlas : failed (atlas is in use, close coordinate windows) #")
+        sys.exit(1)
+    print("# build atlas : '" + atlasPath + "' #")
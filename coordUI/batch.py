@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  headless coordinate batch renderer
+#  @file   batch.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+#  [usage]\n
+#  python -m coordUI.batch <imgDir> <outDir> [--head uc01_*] [--processes 8]\n
+#
+# #########################################################
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import fnmatch
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+
+# render without display
+if 'QT_QPA_PLATFORM' not in os.environ:
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+from PySide2 import QtGui
+from PySide2 import QtCore
+
+from . import cache
+from . import catalog
+from . import loader
+try:
+    import numpy as np
+    from . import blend
+except ImportError:
+    np = None
+    blend = None
+
+
+# layer order (front to back), same as toolGUI.layerNames
+layerOrder = ['head', 'body', 'leg', 'hair', 'acce']
+# category which can be empty in GUI
+optionalCategories = ['hair', 'acce']
+defLogo = 'UCL_logo'
+defCellSize = 256
+defColumns = 8
+defRows = 8
+labelHeight = 16
+# compositing engine ('numpy' : blend module, 'qt' : QPainter)
+if blend is not None:
+    defEngine = 'numpy'
+else:
+    defEngine = 'qt'
+
+# per process cache
+_catalogs = {}
+_partCache = cache.LRUCache(256 * 1024 * 1024)
+_compositor = None
+
+
+# ---------------------------------------------------------
+# get gui application (offscreen)
+# ---------------------------------------------------------
+# @param None
+# @return <QtGui.QGuiApplication>app : application
+def getApplication():
+    app = QtGui.QGuiApplication.instance()
+    if app is None:
+        app = QtGui.QGuiApplication([sys.argv[0]])
+    return app
+
+
+# ---------------------------------------------------------
+# get catalog (cached per process)
+# ---------------------------------------------------------
+# @param <str>imgDir    : thumbnail directory
+# @param <str>thumbName : thumbnail file name
+# @return <catalog.Catalog>coordCatalog : catalog
+def getCatalog(imgDir, thumbName='[coordID].png'):
+    key = (imgDir, thumbName)
+    if key not in _catalogs:
+        coordCatalog = catalog.Catalog(imgDir, thumbName)
+        coordCatalog.scan()
+        _catalogs[key] = coordCatalog
+    return _catalogs[key]
+
+
+# ---------------------------------------------------------
+# list combinations
+# ---------------------------------------------------------
+# @param <catalog.Catalog>coordCatalog : catalog
+# @param <dict>filters : {category : [fnmatch pattern]} (None : all)
+# @return <tuple/List>comboList : (head, body, leg, hair, acce) ('' : none)
+def listCombinations(coordCatalog, filters=None):
+    filters = filters or {}
+    partLists = []
+    for category in layerOrder:
+        idList = coordCatalog.getIDs(category)
+        if category in optionalCategories:
+            idList = idList + ['']
+        patterns = filters.get(category)
+        if patterns:
+            idList = [i for i in idList
+                      if any(fnmatch.fnmatch(i or 'None', p) for p in patterns)]
+        partLists.append(idList)
+    return list(itertools.product(*partLists))
+
+
+# ---------------------------------------------------------
+# get part image (cached per process)
+# ---------------------------------------------------------
+# @param <catalog.Catalog>coordCatalog : catalog
+# @param <str>coordID                  : coordinate ID
+# @param <int/List>wh                  : width and height
+# @return <QtGui.QImage>image : scaled image (None if not exist)
+def getPartImage(coordCatalog, coordID, wh):
+    path = coordCatalog.getPath(coordID)
+    if not path:
+        return None
+    key = cache.makeKey(path, wh, coordCatalog.getMtime(path))
+    image = _partCache.get(key)
+    if image is None:
+        image = _partCache.put(key, loader.decodeImage(path, wh))
+    return image
+
+
+# ---------------------------------------------------------
+# render combination
+# ---------------------------------------------------------
+# @param <catalog.Catalog>coordCatalog : catalog
+# @param <str/List>combo               : part IDs (layerOrder)
+# @param <int/List>wh                  : width and height
+# @param <str>logo                     : logo ID ('' : none)
+# @return <QtGui.QImage>image : composite
+def renderCombination(coordCatalog, combo, wh, logo=defLogo):
+    image = QtGui.QImage(wh[0], wh[1], QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.fill(QtCore.Qt.transparent)
+    painter = QtGui.QPainter(image)
+    # draw back to front
+    for coordID in reversed(list(combo) + [logo]):
+        part = getPartImage(coordCatalog, coordID, wh)
+        if part is None or part.isNull():
+            continue
+        painter.drawImage((wh[0] - part.width()) // 2, (wh[1] - part.height()) // 2, part)
+    painter.end()
+    return image
+
+
+# ---------------------------------------------------------
+# image to array (centered on canvas)
+# ---------------------------------------------------------
+# @param <QtGui.QImage>image : image
+# @param <int/List>wh        : canvas width and height
+# @return <numpy.ndarray>array : (height, width, 4) uint8 premultiplied
+def imageToArray(image, wh):
+    canvas = QtGui.QImage(wh[0], wh[1], QtGui.QImage.Format_ARGB32_Premultiplied)
+    canvas.fill(QtCore.Qt.transparent)
+    painter = QtGui.QPainter(canvas)
+    painter.drawImage((wh[0] - image.width()) // 2, (wh[1] - image.height()) // 2, image)
+    painter.end()
+    bpl = canvas.bytesPerLine()
+    array = np.frombuffer(canvas.constBits(), np.uint8, count=bpl * wh[1])
+    return array.reshape(wh[1], bpl)[:, :wh[0] * 4].reshape(wh[1], wh[0], 4).copy()
+
+
+# ---------------------------------------------------------
+# array to image
+# ---------------------------------------------------------
+# @param <numpy.ndarray>array : (height, width, 4) uint8 premultiplied
+# @return <QtGui.QImage>image : image
+def arrayToImage(array):
+    array = np.ascontiguousarray(array)
+    height, width = array.shape[:2]
+    image = QtGui.QImage(array.data, width, height, width * 4,
+                         QtGui.QImage.Format_ARGB32_Premultiplied)
+    return image.copy()
+
+
+# ---------------------------------------------------------
+# render combinations at once (numpy)
+# ---------------------------------------------------------
+# @param <catalog.Catalog>coordCatalog : catalog
+# @param <tuple/List>comboList         : combinations (layerOrder)
+# @param <int/List>wh                  : width and height
+# @param <str>logo                     : logo ID ('' : none)
+# @return <numpy.ndarray>array : (combination, height, width, 4) composite
+def renderCombinationArray(coordCatalog, comboList, wh, logo=defLogo):
+    global _compositor
+    if _compositor is None:
+        _compositor = blend.Compositor()
+    rowList = [list(c) + [logo] for c in comboList]
+    partStacks = []
+    comboIndex = np.full((len(rowList), len(layerOrder) + 1), -1, np.intp)
+    for n in range(len(layerOrder) + 1):
+        idList = sorted(set([r[n] for r in rowList if coordCatalog.getPath(r[n])]))
+        arrayList = [imageToArray(getPartImage(coordCatalog, i, wh), wh) for i in idList]
+        if not arrayList:
+            arrayList = [np.zeros((wh[1], wh[0], 4), np.uint8)]
+        partStacks.append(np.stack(arrayList))
+        for m, row in enumerate(rowList):
+            if row[n] in idList:
+                comboIndex[m, n] = idList.index(row[n])
+    return _compositor.compositeBatch(partStacks, comboIndex)
+
+
+# ---------------------------------------------------------
+# make combination label
+# ---------------------------------------------------------
+# @param <str/List>combo : part IDs
+# @return <str>label : label
+def makeLabel(combo):
+    return ' '.join([catalog.getPrefix(c) if c else '-' for c in combo])
+
+
+# ---------------------------------------------------------
+# render contact sheet (worker process)
+# ---------------------------------------------------------
+# @param <tuple>task : (imgDir, thumbName, comboList, sheetPath, cellSize, columns, logo, engine)
+# @return <str>sheetPath : sheet path
+def renderSheet(task):
+    imgDir, thumbName, comboList, sheetPath, cellSize, columns, logo, engine = task
+    getApplication()
+    coordCatalog = getCatalog(imgDir, thumbName)
+    if engine == 'numpy':
+        compArray = renderCombinationArray(coordCatalog, comboList, [cellSize, cellSize], logo)
+    rows = (len(comboList) + columns - 1) // columns
+    cellHeight = cellSize + labelHeight
+    sheet = QtGui.QImage(cellSize * columns, cellHeight * rows,
+                         QtGui.QImage.Format_ARGB32_Premultiplied)
+    sheet.fill(QtGui.QColor(48, 48, 48))
+    painter = QtGui.QPainter(sheet)
+    painter.setPen(QtGui.QColor(220, 220, 220))
+    for n, combo in enumerate(comboList):
+        xpos = (n % columns) * cellSize
+        ypos = (n // columns) * cellHeight
+        if engine == 'numpy':
+            cell = arrayToImage(compArray[n])
+        else:
+            cell = renderCombination(coordCatalog, combo, [cellSize, cellSize], logo)
+        painter.drawImage(xpos, ypos, cell)
+        painter.drawText(QtCore.QRect(xpos, ypos + cellSize, cellSize, labelHeight),
+                         QtCore.Qt.AlignCenter, makeLabel(combo))
+    painter.end()
+    sheet.save(sheetPath)
+
+    # sheet index
+    f = open(os.path.splitext(sheetPath)[0] + '.json', 'w')
+    with f:
+        json.dump({'layers': layerOrder, 'logo': logo,
+                   'cells': [list(c) for c in comboList]}, f, indent=2)
+
+    return sheetPath
+
+
+# ---------------------------------------------------------
+# render all combinations to contact sheets
+# ---------------------------------------------------------
+# @param <str>imgDir     : thumbnail directory
+# @param <str>outDir     : output directory
+# @param <dict>filters   : {category : [fnmatch pattern]}
+# @param <int>cellSize   : cell size
+# @param <int>columns    : column count of sheet
+# @param <int>rows       : row count of sheet
+# @param <str>logo       : logo ID ('' : none)
+# @param <int>processes  : process count (None : cpu count, 1 : no pool)
+# @param <str>thumbName  : thumbnail file name
+# @param <str>engine     : compositing engine ('numpy' or 'qt')
+# @return <str/List>sheetList : sheet paths
+def renderAll(imgDir, outDir, filters=None, cellSize=defCellSize, columns=defColumns,
+              rows=defRows, logo=defLogo, processes=None, thumbName='[coordID].png',
+              engine=defEngine):
+    if engine == 'numpy' and blend is None:
+        print("## WARN : numpy is not available, use qt engine ##")
+        engine = 'qt'
+    imgDir = imgDir.replace('\\', '/')
+    outDir = outDir.replace('\\', '/')
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+    comboList = listCombinations(getCatalog(imgDir, thumbName), filters)
+    perSheet = columns * rows
+    taskList = []
+    for n in range(0, len(comboList), perSheet):
+        sheetPath = '%s/sheet_%04d.png' % (outDir, n // perSheet + 1)
+        taskList.append((imgDir, thumbName, comboList[n:n + perSheet], sheetPath,
+                         cellSize, columns, logo, engine))
+    print("# render : %d combinations, %d sheets #" % (len(comboList), len(taskList)))
+
+    sheetList = []
+    if processes == 1 or len(taskList) < 2:
+        for task in taskList:
+            sheetList.append(renderSheet(task))
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for sheetPath in pool.imap_unordered(renderSheet, taskList):
+                print("# done : '" + sheetPath + "' #")
+                sheetList.append(sheetPath)
+        finally:
+            pool.close()
+            pool.join()
+
+    return sorted(sheetList)
+
+
+# ---------------------------------------------------------
+# main
+# ---------------------------------------------------------
+# @param <str/List>argv : arguments
+# @return None
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='render coordinate contact sheets')
+    parser.add_argument('imgDir')
+    parser.add_argument('outDir')
+    for category in layerOrder:
+        parser.add_argument('--' + category, action='append', metavar='PATTERN',
+                            help=category + ' ID pattern (None : empty)')
+    parser.add_argument('--cell', type=int, default=defCellSize)
+    parser.add_argument('--columns', type=int, default=defColumns)
+    parser.add_argument('--rows', type=int, default=defRows)
+    parser.add_argument('--logo', default=defLogo)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--engine', choices=['numpy', 'qt'], default=defEngine)
+    args = parser.parse_args(argv)
+
+    filters = dict((c, getattr(args, c)) for c in layerOrder if getattr(args, c))
+    renderAll(args.imgDir, args.outDir, filters, args.cell, args.columns, args.rows,
+              args.logo, args.processes, engine=args.engine)
+
+
+# ----------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,503 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  coordinate window benchmark
+#  @file   benchmark.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+#  [usage]\n
+#  python -m coordUI.benchmark --sizes 10 100 1000 10000 --json result.json\n
+#  runs without maya (maya.cmds is stubbed with plain Qt widgets)\n
+#
+# #########################################################
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# render without display
+if 'QT_QPA_PLATFORM' not in os.environ:
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+from PySide2 import QtGui
+from PySide2 import QtWidgets
+from PySide2 import QtCore
+try:
+    import shiboken2
+except ImportError:
+    from PySide2 import shiboken2
+
+
+defSizes = [10, 100, 1000, 10000]
+defIterations = 50
+imageSize = 1080
+templateCount = 8
+categories = ['head', 'body', 'leg', 'hair', 'acce']
+readyTimeout = 30.0
+
+
+# ---------------------------------------------------------
+# maya.cmds stub (maya UI is made of plain QWidget)
+# ---------------------------------------------------------
+class CmdsStub(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def __init__(self):
+        self.count = 0
+        self.widgets = {}
+        self.windows = []
+        self.menus = {}
+        self.menuItems = {}
+        self.current = None
+        self.currentMenu = None
+
+    # ---------------------------------------------------------
+    # make module (maya.cmds)
+    # ---------------------------------------------------------
+    # @param None
+    # @return <module>module : module
+    def makeModule(self):
+        module = types.ModuleType('maya.cmds')
+        for name in ['window', 'showWindow', 'deleteUI', 'formLayout', 'columnLayout',
+                     'tabLayout', 'setParent', 'optionMenu', 'menu', 'menuItem', 'button',
+                     'evalDeferred']:
+            setattr(module, name, getattr(self, name))
+        return module
+
+    def makeName(self, kind):
+        self.count += 1
+        return '%s%d' % (kind, self.count)
+
+    def makeWidget(self, kind, kw):
+        name = self.makeName(kind)
+        parent = kw.get('p', kw.get('parent', self.current))
+        widget = QtWidgets.QWidget(self.widgets.get(parent))
+        self.widgets[name] = widget
+        return name
+
+    def window(self, name=None, exists=False, e=False, **kw):
+        if exists:
+            return name in self.windows
+        if e:
+            widget = self.widgets[name]
+            widget.resize(kw.get('w', widget.width()), kw.get('h', widget.height()))
+            return name
+        widget = QtWidgets.QWidget()
+        self.widgets[name] = widget
+        self.windows.append(name)
+        self.current = name
+        return name
+
+    def showWindow(self, name=None):
+        self.widgets[name or self.windows[-1]].show()
+
+    def deleteUI(self, names):
+        if not isinstance(names, (list, tuple)):
+            names = [names]
+        for name in names:
+            if name in self.menuItems:
+                label, menu = self.menuItems.pop(name)
+                self.menus[menu]['items'].remove(name)
+            elif name in self.widgets:
+                widget = self.widgets.pop(name)
+                if name in self.windows:
+                    self.windows.remove(name)
+                widget.deleteLater()
+
+    def layout(self, kind, args, kw):
+        if args and (kw.get('e') or kw.get('q')):
+            if kw.get('h') is not None:
+                self.widgets[args[0]].setFixedHeight(int(kw['h']))
+            return args[0]
+        name = self.makeWidget(kind, kw)
+        self.current = name
+        return name
+
+    def formLayout(self, *args, **kw):
+        return self.layout('formLayout', args, kw)
+
+    def columnLayout(self, *args, **kw):
+        return self.layout('columnLayout', args, kw)
+
+    def tabLayout(self, *args, **kw):
+        return self.layout('tabLayout', args, kw)
+
+    def setParent(self, name):
+        if name == '..':
+            widget = self.widgets.get(self.current)
+            parent = widget.parentWidget() if widget is not None else None
+            for pname, pwidget in self.widgets.items():
+                if pwidget is parent:
+                    self.current = pname
+                    break
+        else:
+            self.current = name
+
+    def optionMenu(self, *args, **kw):
+        if args:
+            menu = self.menus[args[0]]
+            if kw.get('q'):
+                if kw.get('ill'):
+                    return list(menu['items'])
+                if kw.get('ni'):
+                    return len(menu['items'])
+                if kw.get('v'):
+                    return self.menuItems[menu['items'][menu['value']]][0]
+            if kw.get('e') and 'v' in kw:
+                labels = [self.menuItems[i][0] for i in menu['items']]
+                menu['value'] = labels.index(kw['v'])
+            return args[0]
+        name = self.makeWidget('optionMenu', kw)
+        self.menus[name] = {'items': [], 'value': 0, 'cc': kw.get('cc')}
+        return name
+
+    def menu(self, *args, **kw):
+        name = self.makeName('menu')
+        self.menus[name] = {'items': [], 'value': 0, 'cc': None}
+        self.currentMenu = name
+        return name
+
+    def menuItem(self, *args, **kw):
+        if args:
+            if kw.get('q'):
+                return self.menuItems[args[0]][0]
+            if kw.get('e') and 'l' in kw:
+                self.menuItems[args[0]][0] = kw['l']
+            return args[0]
+        name = self.makeName('menuItem')
+        menu = kw.get('p', self.currentMenu)
+        self.menuItems[name] = [kw.get('l', ''), menu]
+        self.menus[menu]['items'].append(name)
+        return name
+
+    def button(self, *args, **kw):
+        return self.makeWidget('button', kw)
+
+    def evalDeferred(self, func, *args, **kw):
+        QtCore.QTimer.singleShot(0, func)
+
+
+# ---------------------------------------------------------
+# maya.OpenMayaUI.MQtUtil stub
+# ---------------------------------------------------------
+class MQtUtilStub(object):
+    cmdsStub = None
+
+    @classmethod
+    def findControl(cls, name):
+        widget = cls.cmdsStub.widgets.get(name)
+        if widget is None:
+            return None
+        return shiboken2.getCppPointer(widget)[0]
+
+    findLayout = findControl
+
+    @classmethod
+    def findMenuItem(cls, name):
+        return None
+
+
+# ---------------------------------------------------------
+# install maya stub modules
+# ---------------------------------------------------------
+# @param None
+# @return <CmdsStub>cmdsStub : cmds stub
+def installMayaStub():
+    cmdsStub = CmdsStub()
+    MQtUtilStub.cmdsStub = cmdsStub
+    mayaModule = types.ModuleType('maya')
+    cmdsModule = cmdsStub.makeModule()
+    omUIModule = types.ModuleType('maya.OpenMayaUI')
+    omUIModule.MQtUtil = MQtUtilStub
+    mayaModule.cmds = cmdsModule
+    mayaModule.OpenMayaUI = omUIModule
+    sys.modules['maya'] = mayaModule
+    sys.modules['maya.cmds'] = cmdsModule
+    sys.modules['maya.OpenMayaUI'] = omUIModule
+    return cmdsStub
+
+
+# ---------------------------------------------------------
+# make synthetic catalog
+# ---------------------------------------------------------
+# @param <str>imgDir  : output directory
+# @param <int>parts   : part count
+# @param <int>seed    : random seed
+# @return None
+def makeCatalog(imgDir, parts, seed=0):
+    rand = random.Random(seed)
+    templateDir = imgDir + '/_template'
+    os.makedirs(templateDir)
+    templateList = []
+    for n in range(templateCount):
+        image = QtGui.QImage(imageSize, imageSize, QtGui.QImage.Format_ARGB32)
+        image.fill(QtCore.Qt.transparent)
+        painter = QtGui.QPainter(image)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        for m in range(6):
+            painter.setBrush(QtGui.QColor(rand.randint(0, 255), rand.randint(0, 255),
+                                          rand.randint(0, 255), rand.randint(96, 255)))
+            painter.drawEllipse(rand.randint(0, imageSize // 2), rand.randint(0, imageSize // 2),
+                                rand.randint(64, imageSize // 2), rand.randint(64, imageSize // 2))
+        painter.end()
+        path = '%s/template%d.png' % (templateDir, n)
+        image.save(path)
+        templateList.append(path)
+    for n in range(parts):
+        name = 'sc%05d_%s.png' % (n // len(categories), categories[n % len(categories)])
+        shutil.copyfile(rand.choice(templateList), imgDir + '/' + name)
+    shutil.copyfile(templateList[0], imgDir + '/UCL_logo.png')
+    shutil.rmtree(templateDir)
+
+
+# ---------------------------------------------------------
+# percentile summary
+# ---------------------------------------------------------
+# @param <float/List>values : values (sec)
+# @return <dict>summary : msec summary
+def summarize(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def percentile(ratio):
+        pos = (len(values) - 1) * ratio
+        low = int(pos)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (pos - low)
+
+    return {'count': len(values),
+            'mean': sum(values) / len(values) * 1000.0,
+            'p50': percentile(0.50) * 1000.0,
+            'p90': percentile(0.90) * 1000.0,
+            'p99': percentile(0.99) * 1000.0,
+            'max': values[-1] * 1000.0}
+
+
+# ---------------------------------------------------------
+# get peak memory (KB)
+# ---------------------------------------------------------
+# @param None
+# @return <int>peak : peak resident size (None if unknown)
+def getPeakMemory():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+# ---------------------------------------------------------
+# wait until thumbnail loading is done
+# ---------------------------------------------------------
+# @param <QtWidgets.QApplication>app : application
+# @param <coordUI.gui.toolGUI>gui    : window
+# @return None
+def waitReady(app, gui):
+    start = time.time()
+    app.processEvents()
+    while gui.pendingLayers > 0 and time.time() - start < readyTimeout:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 10)
+    gui.coordGView.viewport().repaint()
+
+
+# ---------------------------------------------------------
+# time gui methods
+# ---------------------------------------------------------
+# @param <coordUI.gui.toolGUI>gui : window
+# @param <str/List>methodList     : method names
+# @return <dict>timeDict : {method : [sec]}
+def wrapMethods(gui, methodList):
+    timeDict = dict((m, []) for m in methodList)
+
+    def makeWrapper(name, func):
+        def wrapper(*args, **kw):
+            start = time.time()
+            try:
+                return func(*args, **kw)
+            finally:
+                timeDict[name].append(time.time() - start)
+        return wrapper
+
+    for name in methodList:
+        setattr(gui, name, makeWrapper(name, getattr(gui, name)))
+    return timeDict
+
+
+# ---------------------------------------------------------
+# run benchmark of one catalog size (in this process)
+# ---------------------------------------------------------
+# @param <int>parts      : part count
+# @param <int>iterations : iteration count of switch, zoom and pan
+# @param <bool>diskCache : use disk cache
+# @return <dict>result : result
+def runSingle(parts, iterations=defIterations, diskCache=False):
+    cmdsStub = installMayaStub()
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([sys.argv[0]])
+    from coordUI import gui as coordGui
+
+    workDir = tempfile.mkdtemp(prefix='coordUI_bench_')
+    try:
+        imgDir = (workDir + '/img').replace('\\', '/')
+        os.makedirs(imgDir)
+        makeCatalog(imgDir, parts)
+
+        class benchGUI(coordGui.toolGUI):
+            thumbnailPath = imgDir
+            useDiskCache = diskCache
+            diskCacheDir = (workDir + '/cache').replace('\\', '/')
+            pixmapCache = coordGui.cache.LRUCache(coordGui.cache.defMaxBytes)
+            compositeCache = coordGui.cache.LRUCache(32 * 1024 * 1024)
+
+        result = {'parts': parts, 'peakMemoryKB': {}}
+        gui = benchGUI()
+        timeDict = wrapMethods(gui, ['reloadAllOptMenu', 'loadThumb', 'reloadPicture'])
+
+        # window open
+        start = time.time()
+        gui.show()
+        # first visible window (deferred thumbnail not loaded yet)
+        gui.coordGView.viewport().repaint()
+        result['firstShow'] = summarize([time.time() - start])
+        waitReady(app, gui)
+        result['open'] = summarize([time.time() - start])
+        result['peakMemoryKB']['open'] = getPeakMemory()
+
+        # part switch
+        switchTimes = []
+        menuList = [(gui.headOMenu, 0), (gui.bodyOMenu, 1), (gui.legOMenu, 1),
+                    (gui.hairOMenu, 0), (gui.acceOMenu, 0)]
+        for n in range(iterations):
+            oMenu, switch = menuList[n % len(menuList)]
+            labels = [cmdsStub.menuItems[i][0] for i in cmdsStub.menus[oMenu]['items']]
+            cmdsStub.optionMenu(oMenu, e=True, v=labels[(n // len(menuList) + 1) % len(labels)])
+            start = time.time()
+            gui.ui_action(switch)
+            waitReady(app, gui)
+            switchTimes.append(time.time() - start)
+        result['switch'] = summarize(switchTimes)
+        result['peakMemoryKB']['switch'] = getPeakMemory()
+
+        # zoom and pan
+        gView = gui.coordGView
+        center = gView.viewport().rect().center()
+        zoomTimes = []
+        panTimes = []
+        for n in range(iterations):
+            gView.zoomPivot = gView.mapToGlobal(center)
+            gView.zoomDelta = 8 if (n // 10) % 2 == 0 else -8
+            start = time.time()
+            gView.applyInput()
+            app.processEvents()
+            gView.viewport().repaint()
+            zoomTimes.append(time.time() - start)
+
+            gView.panDelta = QtCore.QPoint(6 if n % 2 else -6, 4)
+            start = time.time()
+            gView.applyInput()
+            gView.viewport().repaint()
+            panTimes.append(time.time() - start)
+        result['zoom'] = summarize(zoomTimes)
+        result['pan'] = summarize(panTimes)
+        result['peakMemoryKB']['zoomPan'] = getPeakMemory()
+
+        result['methods'] = dict((k, summarize(v)) for k, v in timeDict.items())
+        result['pixmapCache'] = gui.pixmapCache.stats()
+        gui.imageLoader.cancel()
+        gui.imageLoader.wait()
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    return result
+
+
+# ---------------------------------------------------------
+# run benchmark of each catalog size (one process per size)
+# ---------------------------------------------------------
+# @param <int/List>sizes  : part counts
+# @param <int>iterations  : iteration count
+# @param <bool>diskCache  : use disk cache
+# @return <dict/List>resultList : results
+def runAll(sizes=defSizes, iterations=defIterations, diskCache=False):
+    packageDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([packageDir, env.get('PYTHONPATH', '')])
+    resultList = []
+    for parts in sizes:
+        cmd = [sys.executable, '-m', 'coordUI.benchmark', '--single', str(parts),
+               '--iterations', str(iterations)]
+        if diskCache:
+            cmd.append('--disk-cache')
+        out = subprocess.check_output(cmd, env=env)
+        resultList.append(json.loads(out.decode('utf-8').strip().splitlines()[-1]))
+        printResult(resultList[-1])
+    return resultList
+
+
+# ---------------------------------------------------------
+# print result
+# ---------------------------------------------------------
+# @param <dict>result : result
+# @return None
+def printResult(result):
+    print("# parts : %d #" % result['parts'])
+    for stage in ['firstShow', 'open', 'switch', 'zoom', 'pan']:
+        summary = result[stage]
+        print("  %-9s p50 %8.2fms  p90 %8.2fms  p99 %8.2fms  max %8.2fms" %
+              (stage, summary['p50'], summary['p90'], summary['p99'], summary['max']))
+    for name, summary in sorted(result['methods'].items()):
+        if summary:
+            print("  %-18s x%-4d p50 %8.2fms  max %8.2fms" %
+                  (name, summary['count'], summary['p50'], summary['max']))
+    print("  peak memory : %s KB" % result['peakMemoryKB'])
+
+
+# ---------------------------------------------------------
+# main
+# ---------------------------------------------------------
+# @param <str/List>argv : arguments
+# @return None
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='coordinate window benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=defSizes)
+    parser.add_argument('--iterations', type=int, default=defIterations)
+    parser.add_argument('--disk-cache', action='store_true')
+    parser.add_argument('--json', help='write results to json file')
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        result = runSingle(args.single, args.iterations, args.disk_cache)
+        print(json.dumps(result))
+        return
+
+    resultList = runAll(args.sizes, args.iterations, args.disk_cache)
+    if args.json:
+        f = open(args.json, 'w')
+        with f:
+            json.dump(resultList, f, indent=2)
+
+
+# ----------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  numpy alpha compositing (premultiplied)
+#  @file   blend.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+#  [note]\n
+#  image array : (..., height, width, 4) premultiplied, uint8 or float\n
+#  layer order : front to back (same as toolGUI.layerNames)\n
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+import numpy as np
+
+
+# alpha channel index (ARGB32 on little endian is BGRA)
+defAlphaIndex = 3
+
+
+# ---------------------------------------------------------
+# premultiply straight alpha image
+# ---------------------------------------------------------
+# @param <np.ndarray>image   : straight alpha image
+# @param <int>alphaIndex     : alpha channel index
+# @return <np.ndarray>image : premultiplied image
+def premultiply(image, alphaIndex=defAlphaIndex):
+    result = image.copy()
+    alpha = image[..., alphaIndex:alphaIndex + 1]
+    if np.issubdtype(image.dtype, np.floating):
+        result *= alpha
+    else:
+        tmp = image.astype(np.uint16) * alpha + 127
+        result[...] = tmp // 255
+    result[..., alphaIndex] = image[..., alphaIndex]
+    return result
+
+
+# ---------------------------------------------------------
+# compositor (keeps scratch buffers between calls)
+# ---------------------------------------------------------
+class Compositor(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <int>alphaIndex : alpha channel index
+    # @return None
+    def __init__(self, alphaIndex=defAlphaIndex):
+        self.alphaIndex = alphaIndex
+        self._buffers = {}
+
+    # ---------------------------------------------------------
+    # get scratch buffer
+    # ---------------------------------------------------------
+    # @param <str>name     : buffer name
+    # @param <tuple>shape  : shape
+    # @param <dtype>dtype  : dtype
+    # @return <np.ndarray>buf : buffer (content undefined)
+    def scratch(self, name, shape, dtype):
+        key = (name, tuple(shape), np.dtype(dtype))
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = np.empty(shape, dtype)
+            self._buffers[key] = buf
+        return buf
+
+    # ---------------------------------------------------------
+    # release scratch buffers
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def clear(self):
+        self._buffers.clear()
+
+    # ---------------------------------------------------------
+    # src over dst
+    # ---------------------------------------------------------
+    # @param <np.ndarray>dst : back image
+    # @param <np.ndarray>src : front image (broadcastable to dst)
+    # @param <np.ndarray>out : output (may be dst, None : new array)
+    # @return <np.ndarray>out : composite
+    def over(self, dst, src, out=None):
+        if out is None:
+            out = np.empty_like(dst)
+        ai = self.alphaIndex
+        srcAlpha = src[..., ai:ai + 1]
+        alphaShape = np.broadcast(dst[..., :1], srcAlpha).shape
+        if np.issubdtype(dst.dtype, np.floating):
+            # out = src + dst * (1 - srcAlpha)
+            inv = self.scratch('inv', alphaShape, dst.dtype)
+            np.subtract(1, srcAlpha, out=inv)
+            np.multiply(dst, inv, out=out)
+            out += src
+        else:
+            # out = src + round(dst * (255 - srcAlpha) / 255)
+            inv = self.scratch('inv', alphaShape, np.uint16)
+            np.subtract(255, srcAlpha, out=inv, dtype=np.uint16)
+            tmp = self.scratch('tmp', dst.shape, np.uint16)
+            tmp2 = self.scratch('tmp2', dst.shape, np.uint16)
+            np.multiply(dst, inv, out=tmp)
+            tmp += 128
+            np.right_shift(tmp, 8, out=tmp2)
+            tmp += tmp2
+            tmp >>= 8
+            np.add(src, tmp, out=out, casting='unsafe')
+        return out
+
+    # ---------------------------------------------------------
+    # composite layer stack
+    # ---------------------------------------------------------
+    # @param <np.ndarray>layers : (layer, ..., height, width, 4) front to back
+    # @param <np.ndarray>out    : output (None : new array)
+    # @return <np.ndarray>out : (..., height, width, 4) composite
+    def composite(self, layers, out=None):
+        if out is None:
+            out = np.zeros(layers.shape[1:], layers.dtype)
+        else:
+            out[...] = 0
+        for n in reversed(range(layers.shape[0])):
+            self.over(out, layers[n], out=out)
+        return out
+
+    # ---------------------------------------------------------
+    # composite batch of combinations
+    # ---------------------------------------------------------
+    # @param <np.ndarray/List>partStacks : per layer (part, height, width, 4) front to back
+    # @param <np.ndarray>comboIndex      : (combination, layer) part index (-1 : empty)
+    # @param <np.ndarray>out             : output (None : new array)
+    # @return <np.ndarray>out : (combination, height, width, 4) composite
+    def compositeBatch(self, partStacks, comboIndex, out=None):
+        comboIndex = np.asarray(comboIndex)
+        imageShape = partStacks[0].shape[1:]
+        dtype = partStacks[0].dtype
+        shape = (comboIndex.shape[0],) + imageShape
+        if out is None:
+            out = np.zeros(shape, dtype)
+        else:
+            out[...] = 0
+        src = self.scratch('src', shape, dtype)
+        for n in reversed(range(len(partStacks))):
+            index = comboIndex[:, n]
+            empty = index < 0
+            if empty.all():
+                continue
+            np.take(partStacks[n], np.where(empty, 0, index), axis=0, out=src)
+            if empty.any():
+                src[empty] = 0
+            self.over(out, src, out=out)
+        return out
+
+
+# ---------------------------------------------------------
+# src over dst (without keeping buffers)
+# ---------------------------------------------------------
+# @param <np.ndarray>dst : back image
+# @param <np.ndarray>src : front image
+# @param <np.ndarray>out : output (None : new array)
+# @return <np.ndarray>out : composite
+def over(dst, src, out=None):
+    return Compositor().over(dst, src, out)
+
+
+# ---------------------------------------------------------
+# composite layer stack (without keeping buffers)
+# ---------------------------------------------------------
+# @param <np.ndarray>layers : (layer, ..., height, width, 4) front to back
+# @param <np.ndarray>out    : output (None : new array)
+# @return <np.ndarray>out : composite
+def composite(layers, out=None):
+    return Compositor().composite(layers, out)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  part browser (model/view, for large catalog)
+#  @file   browser.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+from PySide2 import QtGui
+from PySide2 import QtWidgets
+from PySide2 import QtCore
+
+from . import cache
+from . import loader
+
+
+# ---------------------------------------------------------
+# filter coordinate ID list
+# ---------------------------------------------------------
+# @param <str/List>idList : coordinate ID list
+# @param <str>text        : filter text (space separated, all must match)
+# @return <str/List>idList : filtered list
+def filterIDs(idList, text):
+    wordList = text.lower().split()
+    if not wordList:
+        return list(idList)
+    return [i for i in idList if all(w in i.lower() for w in wordList)]
+
+
+# ---------------------------------------------------------
+# part list model (rows are fetched page by page)
+# ---------------------------------------------------------
+class PartListModel(QtCore.QAbstractListModel):
+    # small thumbnail cache (shared between models)
+    iconCache = cache.LRUCache(16 * 1024 * 1024)
+
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <catalog.Catalog>partCatalog   : catalog
+    # @param <str>category                  : part category
+    # @param <int/List>iconSize             : icon width and height
+    # @param <int>pageSize                  : row count per fetch
+    # @param <diskcache.DiskCache>diskCache : disk cache (None : not use)
+    # @param <obj>parent                    : parent
+    # @return None
+    def __init__(self, partCatalog, category, iconSize=(64, 64), pageSize=200,
+                 diskCache=None, parent=None):
+        super(PartListModel, self).__init__(parent)
+        self.catalog = partCatalog
+        self.category = category
+        self.iconSize = list(iconSize)
+        self.pageSize = pageSize
+        self.filterText = ''
+        self.allIDs = []
+        self.idList = []
+        self.rowDict = {}
+        self.loadedCount = 0
+        # rows waiting for thumbnail / rows being decoded
+        self.pendingRows = set()
+        self.requestedRows = set()
+        self.placeholder = QtGui.QPixmap(*self.iconSize)
+        self.placeholder.fill(QtCore.Qt.transparent)
+        self.imageLoader = loader.ImageLoader(2, diskCache, self)
+        self.imageLoader.loaded.connect(self.onImageLoaded)
+        self.flushTimer = QtCore.QTimer(self)
+        self.flushTimer.setSingleShot(True)
+        self.flushTimer.setInterval(0)
+        self.flushTimer.timeout.connect(self.flushRequests)
+        self.reload()
+
+    # ---------------------------------------------------------
+    # reload coordinate ID list from catalog
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def reload(self):
+        self.allIDs = self.catalog.getIDs(self.category)
+        self.applyFilter(filterIDs(self.allIDs, self.filterText))
+
+    # ---------------------------------------------------------
+    # set filter text (narrowed from current rows if text is extended)
+    # ---------------------------------------------------------
+    # @param <str>text : filter text
+    # @return None
+    def setFilterText(self, text):
+        if text == self.filterText:
+            return
+        if self.filterText and text.startswith(self.filterText):
+            idList = filterIDs(self.idList, text)
+        else:
+            idList = filterIDs(self.allIDs, text)
+        self.filterText = text
+        self.applyFilter(idList)
+
+    # ---------------------------------------------------------
+    # apply filtered list (first page only)
+    # ---------------------------------------------------------
+    # @param <str/List>idList : coordinate ID list
+    # @return None
+    def applyFilter(self, idList):
+        self.beginResetModel()
+        self.imageLoader.cancel()
+        self.pendingRows.clear()
+        self.requestedRows.clear()
+        self.idList = idList
+        self.rowDict = dict((coordID, n) for n, coordID in enumerate(idList))
+        self.loadedCount = min(self.pageSize, len(idList))
+        self.endResetModel()
+
+    # ---------------------------------------------------------
+    # row count (fetched rows only)
+    # ---------------------------------------------------------
+    # @param <QtCore.QModelIndex>parent : parent
+    # @return <int>count : row count
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.loadedCount
+
+    def canFetchMore(self, parent):
+        if parent.isValid():
+            return False
+        return self.loadedCount < len(self.idList)
+
+    # ---------------------------------------------------------
+    # fetch next page
+    # ---------------------------------------------------------
+    # @param <QtCore.QModelIndex>parent : parent
+    # @return None
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        count = min(self.pageSize, len(self.idList) - self.loadedCount)
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self.loadedCount,
+                             self.loadedCount + count - 1)
+        self.loadedCount += count
+        self.endInsertRows()
+
+    # ---------------------------------------------------------
+    # get coordinate ID of row
+    # ---------------------------------------------------------
+    # @param <QtCore.QModelIndex>index : index
+    # @return <str>coordID : coordinate ID ('' if invalid)
+    def getID(self, index):
+        if not index.isValid() or index.row() >= self.loadedCount:
+            return ''
+        return self.idList[index.row()]
+
+    # ---------------------------------------------------------
+    # item data (thumbnail is requested on first display)
+    # ---------------------------------------------------------
+    # @param <QtCore.QModelIndex>index : index
+    # @param <int>role                 : role
+    # @return <obj>value : value
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        coordID = self.getID(index)
+        if not coordID:
+            return None
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.UserRole):
+            return coordID
+        elif role == QtCore.Qt.ToolTipRole:
+            return self.catalog.getPath(coordID)
+        elif role == QtCore.Qt.DecorationRole:
+            key = self.getIconKey(coordID)
+            if key is None:
+                return self.placeholder
+            pixmap = self.iconCache.get(key)
+            if pixmap is not None:
+                return pixmap
+            row = index.row()
+            if row not in self.requestedRows:
+                self.pendingRows.add(row)
+                self.flushTimer.start()
+            return self.placeholder
+        return None
+
+    # ---------------------------------------------------------
+    # get icon cache key
+    # ---------------------------------------------------------
+    # @param <str>coordID : coordinate ID
+    # @return <tuple>key : cache key (None if no image)
+    def getIconKey(self, coordID):
+        imagepath = self.catalog.getPath(coordID)
+        if not imagepath:
+            return None
+        return cache.makeKey(imagepath, self.iconSize, self.catalog.getMtime(imagepath))
+
+    # ---------------------------------------------------------
+    # request thumbnails of displayed rows
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def flushRequests(self):
+        # new request cancels previous one, so unfinished rows are requested again
+        # (newly displayed rows first, one page at most)
+        rowList = sorted(self.pendingRows)
+        rowList += sorted(self.requestedRows - self.pendingRows)
+        rowList = [r for r in rowList if r < self.loadedCount][:self.pageSize]
+        jobs = []
+        for row in rowList:
+            key = self.getIconKey(self.idList[row])
+            jobs.append(((row, key), key[0], self.iconSize))
+        # dropped rows are queued again on next display
+        self.requestedRows = set(rowList)
+        self.pendingRows.clear()
+        if jobs:
+            self.imageLoader.request(jobs)
+
+    # ---------------------------------------------------------
+    # thumbnail loaded
+    # ---------------------------------------------------------
+    # @param <int>requestID : request ID
+    # @param <tuple>tag     : (row, cache key)
+    # @param <QtGui.QImage/diskcache.MappedImage>image : decoded image
+    # @return None
+    def onImageLoaded(self, requestID, tag, image):
+        row, key = tag
+        self.requestedRows.discard(row)
+        pixmap = loader.toPixmap(image)
+        if pixmap.isNull():
+            return
+        self.iconCache.put(key, pixmap)
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+
+# ---------------------------------------------------------
+# part browser widget
+# ---------------------------------------------------------
+class PartBrowser(QtWidgets.QWidget):
+    # (category, coordID)
+    partSelected = QtCore.Signal(str, str)
+
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <catalog.Catalog>partCatalog   : catalog
+    # @param <str>category                  : part category
+    # @param <diskcache.DiskCache>diskCache : disk cache (None : not use)
+    # @param <obj>parent                    : parent
+    # @return None
+    def __init__(self, partCatalog, category, diskCache=None, parent=None):
+        super(PartBrowser, self).__init__(parent)
+        self.category = category
+        self.setWindowTitle('Browse ' + category)
+        self.setWindowFlags(QtCore.Qt.Window)
+        self.model = PartListModel(partCatalog, category, diskCache=diskCache, parent=self)
+        # filter row
+        self.filterEdit = QtWidgets.QLineEdit(self)
+        self.filterEdit.setPlaceholderText('filter')
+        self.filterEdit.setClearButtonEnabled(True)
+        self.filterEdit.textChanged.connect(self.model.setFilterText)
+        # list view (fixed item size to skip measuring every row)
+        self.listView = QtWidgets.QListView(self)
+        self.listView.setViewMode(QtWidgets.QListView.IconMode)
+        self.listView.setResizeMode(QtWidgets.QListView.Adjust)
+        self.listView.setMovement(QtWidgets.QListView.Static)
+        self.listView.setUniformItemSizes(True)
+        self.listView.setLayoutMode(QtWidgets.QListView.Batched)
+        self.listView.setIconSize(QtCore.QSize(*self.model.iconSize))
+        self.listView.setGridSize(QtCore.QSize(self.model.iconSize[0] + 32,
+                                               self.model.iconSize[1] + 24))
+        self.listView.setModel(self.model)
+        self.listView.activated.connect(self.onActivated)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addWidget(self.filterEdit)
+        layout.addWidget(self.listView)
+        self.resize(480, 600)
+
+    # ---------------------------------------------------------
+    # item activated
+    # ---------------------------------------------------------
+    # @param <QtCore.QModelIndex>index : index
+    # @return None
+    def onActivated(self, index):
+        coordID = self.model.getID(index)
+        if coordID:
+            self.partSelected.emit(self.category, coordID)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  memory bounded image cache
+#  @file   cache.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+import os
+import threading
+from collections import OrderedDict
+
+
+# default byte budget (64MB)
+defMaxBytes = 64 * 1024 * 1024
+
+
+# ---------------------------------------------------------
+# get byte size of image object
+# ---------------------------------------------------------
+# @param <QPixmap/QImage>image : image object
+# @return <int>nbytes : byte size
+def imageBytes(image):
+    if image is None:
+        return 0
+    try:
+        return image.width() * image.height() * max(image.depth(), 8) // 8
+    except AttributeError:
+        return 0
+
+
+# ---------------------------------------------------------
+# make cache key
+# ---------------------------------------------------------
+# @param <str>path       : image path
+# @param <int/List>size  : target width and height
+# @param <float>mtime    : modified time (if None, get from file)
+# @param <tuple>trim     : trim (None : full image)
+# @return <tuple>key : (path, mtime, (width, height)[, trim])
+def makeKey(path, size, mtime=None, trim=None):
+    if mtime is None:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = 0
+    if trim is not None:
+        return (path, mtime, tuple(size), trim)
+    return (path, mtime, tuple(size))
+
+
+# ---------------------------------------------------------
+# LRU cache
+# ---------------------------------------------------------
+class LRUCache(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <int>maxBytes     : byte budget
+    # @param <func>sizeFunc    : function to get byte size of value
+    # @return None
+    def __init__(self, maxBytes=defMaxBytes, sizeFunc=imageBytes):
+        self.maxBytes = maxBytes
+        self.sizeFunc = sizeFunc
+        self.curBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    # ---------------------------------------------------------
+    # get value (and mark as recently used)
+    # ---------------------------------------------------------
+    # @param <tuple>key     : cache key
+    # @param <obj>default   : return value if not cached
+    # @return <obj>value : cached value
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            value, nbytes = self._items.pop(key)
+            self._items[key] = (value, nbytes)
+            self.hits += 1
+            return value
+
+    # ---------------------------------------------------------
+    # put value
+    # ---------------------------------------------------------
+    # @param <tuple>key   : cache key
+    # @param <obj>value   : value
+    # @param <int>nbytes  : byte size (if None, get from sizeFunc)
+    # @return <obj>value : value
+    def put(self, key, value, nbytes=None):
+        if nbytes is None:
+            nbytes = self.sizeFunc(value)
+        with self._lock:
+            self.discard(key)
+            # too large to hold
+            if nbytes > self.maxBytes:
+                return value
+            self._items[key] = (value, nbytes)
+            self.curBytes += nbytes
+            self.evict()
+        return value
+
+    # ---------------------------------------------------------
+    # remove value
+    # ---------------------------------------------------------
+    # @param <tuple>key : cache key
+    # @return <bool> : if removed, True
+    def discard(self, key):
+        with self._lock:
+            if key not in self._items:
+                return False
+            value, nbytes = self._items.pop(key)
+            self.curBytes -= nbytes
+            return True
+
+    # ---------------------------------------------------------
+    # remove all values of path (key[0])
+    # ---------------------------------------------------------
+    # @param <str>path : image path
+    # @return <int>count : removed count
+    def invalidate(self, path):
+        return self.discardWhere(lambda k: k[0] == path)
+
+    # ---------------------------------------------------------
+    # remove values of matched keys
+    # ---------------------------------------------------------
+    # @param <func>match : function (key) -> bool
+    # @return <int>count : removed count
+    def discardWhere(self, match):
+        with self._lock:
+            keys = [k for k in self._items if match(k)]
+            for key in keys:
+                self.discard(key)
+        return len(keys)
+
+    # ---------------------------------------------------------
+    # evict least recently used values until under budget
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def evict(self):
+        with self._lock:
+            while self.curBytes > self.maxBytes and self._items:
+                key, (value, nbytes) = self._items.popitem(last=False)
+                self.curBytes -= nbytes
+                self.evictions += 1
+
+    # ---------------------------------------------------------
+    # set byte budget
+    # ---------------------------------------------------------
+    # @param <int>maxBytes : byte budget
+    # @return None
+    def setMaxBytes(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.evict()
+
+    # ---------------------------------------------------------
+    # clear all values
+    # ---------------------------------------------------------
+    # @param <bool>resetStats : reset hit/miss/eviction count
+    # @return None
+    def clear(self, resetStats=False):
+        with self._lock:
+            self._items.clear()
+            self.curBytes = 0
+            if resetStats:
+                self.hits = 0
+                self.misses = 0
+                self.evictions = 0
+
+    # ---------------------------------------------------------
+    # get statistics
+    # ---------------------------------------------------------
+    # @param None
+    # @return <dict>stats : statistics
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'count': len(self._items),
+                    'bytes': self.curBytes,
+                    'maxBytes': self.maxBytes}
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  coordinate asset catalog
+#  @file   catalog.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+import os
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+from . import profiler
+
+
+# part category
+categories = ['head', 'body', 'leg', 'hair', 'acce']
+
+
+# ---------------------------------------------------------
+# list directory entries as (name, path, mtime)
+# ---------------------------------------------------------
+# @param <str>directory : directory
+# @return <tuple/List>entryList : (name, path, mtime)
+def listEntries(directory):
+    entryList = []
+    if not os.path.isdir(directory):
+        return entryList
+    if scandir is not None:
+        for entry in scandir(directory):
+            if not entry.is_file():
+                continue
+            entryList.append((entry.name, directory + '/' + entry.name,
+                              entry.stat().st_mtime))
+    else:
+        for name in os.listdir(directory):
+            path = directory + '/' + name
+            if not os.path.isfile(path):
+                continue
+            entryList.append((name, path, os.path.getmtime(path)))
+    return entryList
+
+
+# ---------------------------------------------------------
+# get part category from file name
+# ---------------------------------------------------------
+# @param <str>name : file name
+# @return <str>category : category ('' if not part)
+def getCategory(name):
+    lname = name.lower()
+    for category in categories:
+        if '_' + category in lname:
+            return category
+    return ''
+
+
+# ---------------------------------------------------------
+# get coordinate ID prefix (uc02_hair -> uc02)
+# ---------------------------------------------------------
+# @param <str>coordID : coordinate ID
+# @return <str>prefix : prefix
+def getPrefix(coordID):
+    return coordID.split('_')[0]
+
+
+# ---------------------------------------------------------
+# catalog
+# ---------------------------------------------------------
+class Catalog(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <str>directory : thumbnail directory
+    # @param <str>thumbName : thumbnail file name ('[coordID].png')
+    # @return None
+    def __init__(self, directory, thumbName='[coordID].png'):
+        self.directory = directory.replace('\\', '/')
+        self.thumbName = thumbName
+        self.clear()
+
+    # ---------------------------------------------------------
+    # clear index
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def clear(self):
+        self.scanned = False
+        # category : [coordID]
+        self.partIDs = dict((c, []) for c in categories)
+        # coordID : path
+        self.pathDict = {}
+        # path : coordID
+        self.idDict = {}
+        # path : mtime
+        self.mtimeDict = {}
+        # prefix : {category : coordID}
+        self.groupDict = {}
+
+    # ---------------------------------------------------------
+    # scan thumbnail directory (single pass)
+    # ---------------------------------------------------------
+    # @param <tuple/List>entryList : listing of directory (None : list directory)
+    # @return None
+    @profiler.timed('catalog.scan')
+    def scan(self, entryList=None):
+        self.clear()
+        if entryList is None:
+            entryList = listEntries(self.directory)
+        thumbHead, thumbTail = self.thumbName.split('[coordID]')
+        idSets = dict((c, set()) for c in categories)
+        for name, path, mtime in entryList:
+            coordID = name.split('.')[0]
+            # path lookup
+            if (name.startswith(thumbHead) and name.endswith(thumbTail) and
+                    name[len(thumbHead):len(name) - len(thumbTail)] == coordID):
+                self.pathDict[coordID] = path
+                self.idDict[path] = coordID
+                self.mtimeDict[path] = mtime
+            # part category
+            category = getCategory(name)
+            if category:
+                idSets[category].add(coordID)
+        for category in categories:
+            self.partIDs[category] = sorted(idSets[category])
+            for coordID in self.partIDs[category]:
+                group = self.groupDict.setdefault(getPrefix(coordID), {})
+                group[category] = coordID
+        self.scanned = True
+
+    # ---------------------------------------------------------
+    # rescan and get difference
+    # ---------------------------------------------------------
+    # @param <tuple/List>entryList : listing of directory (None : list directory)
+    # @return <dict>diff : {added, removed, modified : [path], categories : [category]}
+    @profiler.timed('catalog.refresh')
+    def refresh(self, entryList=None):
+        oldMtimes = dict(self.mtimeDict)
+        oldIDs = dict((c, list(ids)) for c, ids in self.partIDs.items())
+        self.scan(entryList)
+        diff = {'added': [], 'removed': [], 'modified': [], 'categories': []}
+        for path, mtime in self.mtimeDict.items():
+            if path not in oldMtimes:
+                diff['added'].append(path)
+            elif oldMtimes[path] != mtime:
+                diff['modified'].append(path)
+        diff['removed'] = [p for p in oldMtimes if p not in self.mtimeDict]
+        diff['categories'] = [c for c in categories if self.partIDs[c] != oldIDs[c]]
+        return diff
+
+    # ---------------------------------------------------------
+    # scan if not yet scanned
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def ensureScanned(self):
+        if not self.scanned:
+            self.scan()
+
+    # ---------------------------------------------------------
+    # get coordinate ID list of category
+    # ---------------------------------------------------------
+    # @param <str>category : part category
+    # @return <str/List>coordList : coordinate ID list
+    def getIDs(self, category):
+        self.ensureScanned()
+        return list(self.partIDs.get(category, []))
+
+    # ---------------------------------------------------------
+    # get thumbnail path
+    # ---------------------------------------------------------
+    # @param <str>coordID : coordinate ID
+    # @return <str>path : thumbnail path ('' if not exist)
+    def getPath(self, coordID):
+        self.ensureScanned()
+        return self.pathDict.get(coordID, '')
+
+    # ---------------------------------------------------------
+    # get coordinate ID from thumbnail path
+    # ---------------------------------------------------------
+    # @param <str>path : thumbnail path
+    # @return <str>coordID : coordinate ID ('' if not indexed)
+    def getID(self, path):
+        return self.idDict.get(path, '')
+
+    # ---------------------------------------------------------
+    # get modified time
+    # ---------------------------------------------------------
+    # @param <str>path : thumbnail path
+    # @return <float>mtime : modified time (None if not indexed)
+    def getMtime(self, path):
+        return self.mtimeDict.get(path)
+
+    # ---------------------------------------------------------
+    # get parts sharing coordinate ID prefix
+    # ---------------------------------------------------------
+    # @param <str>coordID : coordinate ID
+    # @return <dict>group : {category : coordID}
+    def getGroup(self, coordID):
+        self.ensureScanned()
+        return dict(self.groupDict.get(getPrefix(coordID), {}))
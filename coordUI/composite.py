@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  flatten layer composite
+#  @file   composite.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+import math
+
+from PySide2 import QtGui
+from PySide2 import QtCore
+
+
+# ---------------------------------------------------------
+# flatten pixmap items into one premultiplied pixmap
+# ---------------------------------------------------------
+# @param <QtWidgets.QGraphicsPixmapItem/List>itemList : layer items
+# @param <float>scale : resolution (pixel per scene unit)
+# @return <tuple>result : (QtGui.QPixmap pixmap, QtCore.QPointF offset)
+def flattenItems(itemList, scale=1.0):
+    layerList = []
+    rect = QtCore.QRectF()
+    for item in sorted(itemList, key=lambda i: i.zValue()):
+        if item.pixmap().isNull():
+            continue
+        layerList.append(item)
+        rect = rect.united(item.sceneBoundingRect())
+    if not layerList:
+        return (QtGui.QPixmap(), QtCore.QPointF())
+
+    size = QtCore.QSize(int(math.ceil(rect.width() * scale)),
+                        int(math.ceil(rect.height() * scale)))
+    image = QtGui.QImage(size, QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.fill(QtCore.Qt.transparent)
+    painter = QtGui.QPainter(image)
+    painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+    painter.scale(scale, scale)
+    painter.translate(-rect.topLeft())
+    # draw back to front
+    for item in layerList:
+        pixmap = item.pixmap()
+        painter.drawPixmap(item.sceneBoundingRect(), pixmap, QtCore.QRectF(pixmap.rect()))
+    painter.end()
+
+    return (QtGui.QPixmap.fromImage(image), rect.topLeft() * scale)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  decoded image disk cache
+#  @file   diskcache.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+#  [format]\n
+#  header : magic(4s) version(I) width(I) height(I) stride(I)\n
+#  data   : ARGB32 premultiplied rows (from offset 32)\n
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+from PySide2 import QtGui
+
+from . import profiler
+
+
+rawMagic = b'CRAW'
+rawVersion = 1
+headerFormat = '<4sIIII'
+dataOffset = 32
+defCacheDir = (tempfile.gettempdir().replace('\\', '/') + '/coordUI/thumbCache')
+# default byte budget (1GB)
+defMaxBytes = 1024 * 1024 * 1024
+
+
+# ---------------------------------------------------------
+# mapped image (QImage refers mapped file memory)
+# ---------------------------------------------------------
+class MappedImage(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <mmap.mmap>mm       : mapped file
+    # @param <QtGui.QImage>image : image on mapped memory
+    # @return None
+    def __init__(self, mm, image):
+        self.mm = mm
+        self.image = image
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # ---------------------------------------------------------
+    # convert to pixmap and release mapping
+    # ---------------------------------------------------------
+    # @param None
+    # @return <QtGui.QPixmap>pixmap : pixmap
+    def toPixmap(self):
+        with self:
+            return QtGui.QPixmap.fromImage(self.image)
+
+    # ---------------------------------------------------------
+    # release mapping
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def close(self):
+        self.image = None
+        if self.mm is not None:
+            try:
+                self.mm.close()
+            except BufferError:
+                pass
+            self.mm = None
+
+
+# ---------------------------------------------------------
+# disk cache
+# ---------------------------------------------------------
+class DiskCache(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <str>directory : cache directory
+    # @param <int>maxBytes  : byte budget
+    # @return None
+    def __init__(self, directory=defCacheDir, maxBytes=defMaxBytes):
+        self.directory = directory
+        self.maxBytes = maxBytes
+
+    # ---------------------------------------------------------
+    # get cache file path
+    # ---------------------------------------------------------
+    # @param <tuple>key : cache key (path, mtime, (width, height))
+    # @return <str>path : cache file path
+    def getPath(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return self.directory + '/' + digest + '.raw'
+
+    # ---------------------------------------------------------
+    # load image (memory mapped, without copy)
+    # ---------------------------------------------------------
+    # @param <tuple>key : cache key
+    # @return <MappedImage>mapped : mapped image (None if not cached)
+    @profiler.timed('diskcache.load')
+    def load(self, key):
+        path = self.getPath(key)
+        try:
+            f = open(path, 'rb')
+            with f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return None
+        headerSize = struct.calcsize(headerFormat)
+        # partly written file
+        if len(mm) < headerSize:
+            mm.close()
+            return None
+        magic, version, width, height, stride = struct.unpack(headerFormat,
+                                                             mm[:headerSize])
+        if (magic != rawMagic or version != rawVersion or
+                len(mm) < dataOffset + stride * height):
+            mm.close()
+            return None
+        if sys.version_info[0] < 3:
+            data = buffer(mm, dataOffset, stride * height)
+        else:
+            data = memoryview(mm)[dataOffset:dataOffset + stride * height]
+        image = QtGui.QImage(data, width, height, stride,
+                             QtGui.QImage.Format_ARGB32_Premultiplied)
+        return MappedImage(mm, image)
+
+    # ---------------------------------------------------------
+    # save image
+    # ---------------------------------------------------------
+    # @param <tuple>key          : cache key
+    # @param <QtGui.QImage>image : image
+    # @return <bool> : if saved, True
+    def save(self, key, image):
+        if image.isNull():
+            return False
+        path = self.getPath(key)
+        if os.path.exists(path):
+            return True
+        image = image.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+        # unique per thread (same key can be decoded by several loaders)
+        tmpPath = '%s.%d.%d.tmp' % (path, os.getpid(), threading.current_thread().ident)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            f = open(tmpPath, 'wb')
+            with f:
+                f.write(struct.pack(headerFormat, rawMagic, rawVersion, image.width(),
+                                    image.height(), image.bytesPerLine()))
+                f.write(b'\0' * (dataOffset - struct.calcsize(headerFormat)))
+                f.write(image.constBits())
+            os.rename(tmpPath, path)
+        except (IOError, OSError):
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            return os.path.exists(path)
+        return True
+
+    # ---------------------------------------------------------
+    # remove old cache files until under budget
+    # ---------------------------------------------------------
+    # @param None
+    # @return <int>count : removed count
+    def prune(self):
+        if not os.path.isdir(self.directory):
+            return 0
+        fileList = []
+        totalBytes = 0
+        for name in os.listdir(self.directory):
+            path = self.directory + '/' + name
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            fileList.append((stat.st_atime, stat.st_size, path))
+            totalBytes += stat.st_size
+        count = 0
+        for atime, size, path in sorted(fileList):
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # mapped by other process
+                continue
+            totalBytes -= size
+            count += 1
+        return count
@@ -11,20 +11,27 @@
 # #########################################################
 from __future__ import absolute_import, division
 
-import glob
+import functools
 import os
 
 from PySide2 import QtGui
 from PySide2 import QtWidgets
 from PySide2 import QtCore
-try:
-    import shiboken2
-except ImportError:
-    from PySide2 import shiboken2
 import maya.cmds as cmds
-import maya.OpenMayaUI as omUI
+
+from . import cache
+from . import catalog
+from . import loader
+from . import manifest
+from . import profiler
 
 
+# python3
+try:
+    long
+except NameError:
+    long = int
+
 # path
 scriptName = os.path.basename(os.path.dirname(__file__))
 scriptDir = os.path.abspath(os.path.dirname(__file__)).replace('\\', '/')
@@ -37,6 +44,12 @@ scriptDir = os.path.abspath(os.path.dirname(__file__)).replace('\\', '/')
 # @param <type>toType : pyside type
 # @return <obj> : pyside obj
 def mayaToPySide(name, toType):
+    # import on first use
+    import maya.OpenMayaUI as omUI
+    try:
+        import shiboken2
+    except ImportError:
+        from PySide2 import shiboken2
 
     ptr = omUI.MQtUtil.findControl(name)
     if not ptr:
@@ -53,6 +66,14 @@ def mayaToPySide(name, toType):
 # graphics view
 # ---------------------------------------------------------
 class GraphView(QtWidgets.QGraphicsView):
+    # view scale
+    scaleChanged = QtCore.Signal(float)
+    # apply accumulated zoom and pan once per frame
+    coalesceInput = True
+    frameInterval = 16
+    # zoom ratio per cursor pixel
+    zoomPerPixel = 1.01
+
     # ---------------------------------------------------------
     # init
     # ---------------------------------------------------------
@@ -64,6 +85,23 @@ class GraphView(QtWidgets.QGraphicsView):
         # value
         self.parent = parent
         self.cursorPos = None
+        self.zoomDelta = 0
+        self.zoomPivot = None
+        self.panDelta = QtCore.QPoint()
+        # frame timer
+        self.frameTimer = QtCore.QTimer(self)
+        self.frameTimer.setSingleShot(True)
+        self.frameTimer.setInterval(self.frameInterval)
+        self.frameTimer.timeout.connect(self.applyInput)
+
+    # ---------------------------------------------------------
+    # paint event
+    # ---------------------------------------------------------
+    # @param <event>event : event
+    # @return None
+    def paintEvent(self, event):
+        with profiler.span('GraphView.paint'):
+            super(GraphView, self).paintEvent(event)
 
     # ---------------------------------------------------------
     # mouse press event
@@ -111,12 +149,28 @@ class GraphView(QtWidgets.QGraphicsView):
                 chpos = deltaPos.y()
             else:
                 chpos = deltaPos.x()
-            if chpos >= 0:
-                scaleRatio = 1.05
-            else:
-                scaleRatio = 0.95
- 
-            localRect = self.mapToScene(curPos.x(), curPos.y())
+            self.zoomDelta += chpos
+            self.zoomPivot = curPos
+        # mouse move mode
+        elif event.buttons() == QtCore.Qt.MidButton:
+            self.panDelta += deltaPos
+        self.cursorPos = curPos
+
+        if self.coalesceInput is False:
+            self.applyInput()
+        elif not self.frameTimer.isActive():
+            self.frameTimer.start()
+
+    # ---------------------------------------------------------
+    # apply accumulated zoom and pan
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def applyInput(self):
+        # zoom
+        if self.zoomDelta:
+            scaleRatio = self.zoomPerPixel ** self.zoomDelta
+            localRect = self.mapToScene(self.zoomPivot.x(), self.zoomPivot.y())
             # move scale pivot
             trans = self.transform().translate(localRect.x(), localRect.y())
             # scale
@@ -125,13 +179,15 @@ class GraphView(QtWidgets.QGraphicsView):
             trans = trans.translate(-localRect.x(), -localRect.y())
             # set transform
             self.setTransform(trans)
-        # mouse move mode
-        elif event.buttons() == QtCore.Qt.MidButton:
+            self.zoomDelta = 0
+            self.scaleChanged.emit(trans.m11())
+        # pan
+        if not self.panDelta.isNull():
             hScrlBar = self.horizontalScrollBar()
             vScrlBar = self.verticalScrollBar()
-            hScrlBar.setValue(hScrlBar.value() - deltaPos.x())
-            vScrlBar.setValue(vScrlBar.value() - deltaPos.y())
-        self.cursorPos = curPos
+            hScrlBar.setValue(hScrlBar.value() - self.panDelta.x())
+            vScrlBar.setValue(vScrlBar.value() - self.panDelta.y())
+            self.panDelta = QtCore.QPoint()
 
     # ---------------------------------------------------------
     # mouse release event
@@ -141,6 +197,9 @@ class GraphView(QtWidgets.QGraphicsView):
     def mouseReleaseEvent(self, event):
         # run default function
         super(GraphView, self).mouseReleaseEvent(event)
+        # flush pending input
+        self.frameTimer.stop()
+        self.applyInput()
         self.cursorPos = None
         # reset mouse cursor
         QtWidgets.qApp.restoreOverrideCursor()
@@ -162,7 +221,39 @@ class toolGUI(object):
     oMenuWidth = 100
     runBtnCol = [0.120, 0.200, 0.350]
     thumbnailPath = scriptDir + '/img'
+    # packed thumbnail file (None : atlas.defAtlasName)
+    atlasName = None
+    manifestName = manifest.defManifestName
     uclLogo = 'UCL_logo'
+    # layer slot (front to back)
+    layerNames = ['head', 'body', 'leg', 'hair', 'acce', 'logo']
+    # scaled pixmap cache (shared between windows)
+    pixmapCache = cache.LRUCache(cache.defMaxBytes)
+    # decode thumbnail on worker thread
+    asyncLoad = True
+    loaderThreads = 2
+    # decoded thumbnail cache on local disk (None : diskcache.defCacheDir)
+    useDiskCache = True
+    diskCacheDir = None
+    # draw flattened composite instead of blending each layer
+    flattenLayers = True
+    compositeCache = cache.LRUCache(32 * 1024 * 1024)
+    # switch pixmap resolution by view scale
+    useLod = True
+    # (None : pyramid.levels)
+    lodLevels = None
+    # crop transparent border of layer by manifest alpha rect
+    trimLayers = True
+    # apply file changes in thumbnail directory while window is open
+    watchThumbnails = True
+    watchPolling = False
+    watchInterval = 2000
+    # option menu of large category holds items around selection ('None' is kept)
+    maxOptMenuItems = 100
+    # decode neighbour items of option menus while idle
+    usePrefetch = True
+    prefetchRadius = 1
+    prefetchMaxJobs = 16
 
     # ---------------------------------------------------------
     # init
@@ -172,34 +263,185 @@ class toolGUI(object):
     def __init__(self):
         if cmds.window(self.windowName, exists=True):
             cmds.deleteUI(self.windowName)
+        self.catalog = catalog.Catalog(self.thumbnailPath, self.thumbName)
+        self.partAtlas = None
+        self.partManifest = None
+        self.partBrowsers = {}
+        self.thumbWatcher = None
+        # optionMenu : all items of category / index of first shown item
+        self.optMenuItems = {}
+        self.optMenuStart = {}
+        if self.useDiskCache:
+            from . import diskcache
+            self.diskCache = diskcache.DiskCache(self.diskCacheDir or diskcache.defCacheDir)
+        else:
+            self.diskCache = None
 
     # ---------------------------------------------------------
     # comboBox : reload option menu item
     # ---------------------------------------------------------
     # @param <obj>oMenu         : optionMenuGrp UI
     # @param <str/List>itemList : Item List
+    # @param <str>value         : centre item of large list (None : first item)
     # @return None
-    def resetOptMenuItem(self, oMenu, itemList):
+    def resetOptMenuItem(self, oMenu, itemList, value=None):
+        self.optMenuItems[oMenu] = itemList
+        start = 0
+        # large category : items around value only
+        if len(itemList) > self.maxOptMenuItems:
+            index = itemList.index(value) if value in itemList else 0
+            start = max(0, min(index - self.maxOptMenuItems // 2,
+                               len(itemList) - self.maxOptMenuItems))
+            end = start + self.maxOptMenuItems
+            shownList = itemList[start:end]
+            # keep 'None' at its end of list
+            if start > 0 and itemList[0] == 'None':
+                shownList = ['None'] + shownList
+            if end < len(itemList) and itemList[-1] == 'None':
+                shownList += ['None']
+            itemList = shownList
+        self.optMenuStart[oMenu] = start
         menuitems = cmds.optionMenu(oMenu, q=True, ill=True)
         if menuitems:
             cmds.deleteUI(menuitems)
         # add items
         for item in itemList:
-            itemUI = cmds.menuItem(l=item, p=oMenu)
-            if item:
-                cmds.menuItem(itemUI, e=True, l=item)
+            cmds.menuItem(l=item, p=oMenu)
+
+    # ---------------------------------------------------------
+    # comboBox : shift shown items when selection is near edge
+    # ---------------------------------------------------------
+    # @param <obj>oMenu : optionMenu UI
+    # @param <str>value : selected value
+    # @return <bool> : if shifted, True
+    def shiftOptMenuItem(self, oMenu, value):
+        itemList = self.optMenuItems.get(oMenu, [])
+        if len(itemList) <= self.maxOptMenuItems or value not in itemList:
+            return False
+        index = itemList.index(value)
+        start = self.optMenuStart.get(oMenu, 0)
+        end = start + self.maxOptMenuItems
+        margin = self.maxOptMenuItems // 4
+        if not ((start > 0 and index - start < margin) or
+                (end < len(itemList) and end - index <= margin)):
+            return False
+        self.resetOptMenuItem(oMenu, itemList, value)
+        cmds.optionMenu(oMenu, e=True, v=value)
+        return True
+
+    # ---------------------------------------------------------
+    # comboBox : select option menu item (shift shown items if needed)
+    # ---------------------------------------------------------
+    # @param <obj>oMenu : optionMenu UI
+    # @param <str>value : value
+    # @return <bool> : if selected, True
+    def selectOptMenuItem(self, oMenu, value):
+        itemList = self.optMenuItems.get(oMenu, [])
+        if value not in itemList:
+            return False
+        labelList = [cmds.menuItem(i, q=True, l=True)
+                     for i in cmds.optionMenu(oMenu, q=True, ill=True) or []]
+        if value not in labelList:
+            self.resetOptMenuItem(oMenu, itemList, value)
+        cmds.optionMenu(oMenu, e=True, v=value)
+        return True
 
     # ---------------------------------------------------------
     # comboBox : reload all option menu in UI
     # ---------------------------------------------------------
-    # @param None
+    # @param <bool>deferLoad : load thumbnail after window is painted
     # @return None
-    def reloadAllOptMenu(self):
+    def reloadAllOptMenu(self, deferLoad=False):
+        from . import atlas
+        self.catalog.scan()
+        self.closeAtlas()
+        atlasName = self.atlasName or atlas.defAtlasName
+        self.partAtlas = atlas.openAtlas(self.thumbnailPath + '/' + atlasName)
+        self.partManifest = manifest.openManifest(self.thumbnailPath + '/' + self.manifestName)
+        if self.diskCache is not None:
+            cmds.evalDeferred(self.diskCache.prune, lowestPriority=True)
         self.reloadHairOptMenu()
         self.reloadheadOptMenu()
         self.reloadlegOptMenu()
-        self.reloadBodyOptMenu()
+        self.reloadBodyOptMenu(False)
         self.reloadAcceOptMenu()
+        if deferLoad:
+            cmds.evalDeferred(self.loadThumb)
+        else:
+            self.loadThumb()
+        for partBrowser in self.partBrowsers.values():
+            partBrowser.model.reload()
+
+    # ---------------------------------------------------------
+    # close atlas (unmapped, so build step can replace it)
+    # ---------------------------------------------------------
+    # @param <obj>args : destroyed signal arguments
+    # @return None
+    def closeAtlas(self, *args):
+        if self.partAtlas is not None:
+            self.partAtlas.close()
+            self.partAtlas = None
+
+    # ---------------------------------------------------------
+    # comboBox : reload option menu of part category (keep selection)
+    # ---------------------------------------------------------
+    # @param <str>category : part category
+    # @return None
+    def reloadCategoryOptMenu(self, category):
+        oMenu = self.getOptMenu(category)
+        value = self.getOptMenuValue(oMenu)
+        reloadFunc = {'head': self.reloadheadOptMenu, 'body': self.reloadBodyOptMenu,
+                      'leg': self.reloadlegOptMenu, 'hair': self.reloadHairOptMenu,
+                      'acce': self.reloadAcceOptMenu}[category]
+        reloadFunc()
+        self.selectOptMenuItem(oMenu, value)
+        partBrowser = self.partBrowsers.get(category)
+        if partBrowser is not None:
+            partBrowser.model.reload()
+
+    # ---------------------------------------------------------
+    # comboBox : thumbnail directory changed
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def onThumbnailsChanged(self):
+        # listing is shared with watcher
+        entryList = None
+        if self.thumbWatcher is not None:
+            entryList = self.thumbWatcher.entryList
+        diff = self.catalog.refresh(entryList)
+        # drop only entries of changed files
+        changedPaths = set(diff['modified'] + diff['removed'])
+        for path in changedPaths:
+            self.pixmapCache.invalidate(path)
+        # browser module is imported when first browser is opened
+        if self.partBrowsers:
+            from . import browser
+            for path in changedPaths:
+                browser.PartListModel.iconCache.invalidate(path)
+        if changedPaths:
+            self.compositeCache.discardWhere(
+                lambda k: any(l is not None and l[0] in changedPaths for l in k[0]))
+        # manifest is rebuilt by build step (python -m coordUI.manifest), only re-read here
+        # (stale parts are shown untrimmed until then)
+        if self.partManifest is not None:
+            self.partManifest.load()
+        for category in diff['categories']:
+            self.reloadCategoryOptMenu(category)
+        # reload thumbnail if shown layer is changed
+        shownPaths = set(k[0] for k in self.layerKeys if k is not None)
+        changedPaths.update(diff['added'])
+        if diff['categories'] or shownPaths & changedPaths:
+            self.loadThumb(True)
+
+    # ---------------------------------------------------------
+    # comboBox : get option menu of part category
+    # ---------------------------------------------------------
+    # @param <str>category : part category
+    # @return <obj>oMenu : optionMenu UI
+    def getOptMenu(self, category):
+        return {'head': self.headOMenu, 'body': self.bodyOMenu, 'leg': self.legOMenu,
+                'hair': self.hairOMenu, 'acce': self.acceOMenu}[category]
 
     # ---------------------------------------------------------
     # comboBox : get option menu item
@@ -234,15 +476,13 @@ class toolGUI(object):
     # ---------------------------------------------------------
     # comboBox : reload body option menu in UI
     # ---------------------------------------------------------
-    # @param None
+    # @param <bool>load : load thumbnail
     # @return None
-    def reloadBodyOptMenu(self):
-        coordList = []
-        globList = glob.glob(self.thumbnailPath + '/*_[bB]ody*')
-        for gfile in globList:
-            coordList.append(os.path.basename(gfile).split('.')[0])
+    def reloadBodyOptMenu(self, load=True):
+        coordList = self.catalog.getIDs('body')
         self.resetOptMenuItem(self.bodyOMenu, coordList)
-        self.loadThumb()
+        if load:
+            self.loadThumb()
 
     # ---------------------------------------------------------
     # comboBox : reload hair option menu in UI
@@ -250,10 +490,7 @@ class toolGUI(object):
     # @param None
     # @return None
     def reloadHairOptMenu(self):
-        coordList = []
-        globList = glob.glob(self.thumbnailPath + '/*_[hH]air*')
-        for gfile in globList:
-            coordList.append(os.path.basename(gfile).split('.')[0])
+        coordList = self.catalog.getIDs('hair')
         coordList += ['None']
         self.resetOptMenuItem(self.hairOMenu, coordList)
 
@@ -263,10 +500,7 @@ class toolGUI(object):
     # @param None
     # @return None
     def reloadheadOptMenu(self):
-        coordList = []
-        globList = glob.glob(self.thumbnailPath + '/*_[hH]ead*')
-        for gfile in globList:
-            coordList.append(os.path.basename(gfile).split('.')[0])
+        coordList = self.catalog.getIDs('head')
         self.resetOptMenuItem(self.headOMenu, coordList)
 
     # ---------------------------------------------------------
@@ -275,10 +509,7 @@ class toolGUI(object):
     # @param None
     # @return None
     def reloadlegOptMenu(self):
-        coordList = []
-        globList = glob.glob(self.thumbnailPath + '/*_[lL]eg*')
-        for gfile in globList:
-            coordList.append(os.path.basename(gfile).split('.')[0])
+        coordList = self.catalog.getIDs('leg')
         self.resetOptMenuItem(self.legOMenu, coordList)
 
     # ---------------------------------------------------------
@@ -287,24 +518,9 @@ class toolGUI(object):
     # @param None
     # @return None
     def reloadAcceOptMenu(self):
-        coordList = ['None']
-        globList = glob.glob(self.thumbnailPath + '/*_[aA]cce*')
-        for gfile in globList:
-            coordList.append(os.path.basename(gfile).split('.')[0])
+        coordList = ['None'] + self.catalog.getIDs('acce')
         self.resetOptMenuItem(self.acceOMenu, coordList)
 
-    # ---------------------------------------------------------
-    # thumbnail : get imageItem from scene
-    # ---------------------------------------------------------
-    # @param <QtWidgets.QGraphicsScene>scene : scene object
-    # @return <QtWidgets.QGraphicsPixmapItem/List>bgimgList : image object
-    def getImgItemFromScn(self, scene):
-        bgimgList = []
-        for item in scene.items():
-            if type(item) == QtWidgets.QGraphicsPixmapItem:
-                bgimgList.append(item)
-        return bgimgList
-
     # ---------------------------------------------------------
     # thumbnail : load thumbnail
     # ---------------------------------------------------------
@@ -318,18 +534,82 @@ class toolGUI(object):
         bodyID = self.getOptMenuValue(self.bodyOMenu)
         acceID = self.getOptMenuValue(self.acceOMenu)
         logo = self.uclLogo
+        # neighbours of selection stay reachable in large category
+        for category in catalog.categories:
+            oMenu = self.getOptMenu(category)
+            self.shiftOptMenuItem(oMenu, self.getOptMenuValue(oMenu))
         # check thumbnail path
-        thumPathList = []
-        imagepath = self.thumbnailPath + '/' + self.thumbName
-        for partid in [headID, bodyID, legID, hairID, acceID, logo]:
-            thumbPath = imagepath.replace('[coordID]', partid)
-            if not os.path.exists(thumbPath):
-                thumbPath = ''
-            thumPathList.append(thumbPath)
+        with profiler.span('loadThumb.resolve'):
+            thumPathList = []
+            for partid in [headID, bodyID, legID, hairID, acceID, logo]:
+                thumPathList.append(self.catalog.getPath(partid))
         # reload this UI
         self.reloadPicture(thumPathList, self.coordThumbnailLayout,
                            widthHeight, keepGviewTrans)
 
+    # ---------------------------------------------------------
+    # thumbnail : get scaled pixmap (cached)
+    # ---------------------------------------------------------
+    # @param <str>imagepath : image path
+    # @param <int/List>wh   : width and height
+    # @param <tuple>trim    : trim (None : full image)
+    # @return <QtGui.QPixmap>pixmap : scaled pixmap
+    def getScaledPixmap(self, imagepath, wh, trim=None):
+        if not imagepath:
+            return QtGui.QPixmap()
+        key = cache.makeKey(imagepath, wh, self.catalog.getMtime(imagepath), trim)
+        pixmap = self.pixmapCache.get(key)
+        if pixmap is not None:
+            return pixmap
+        if self.inAtlas(imagepath, wh):
+            image = self.partAtlas.getImage(self.catalog.getID(imagepath))
+            if trim is not None:
+                x, y, w, h = trim[1]
+                image = image.copy(int(x), int(y), w, h)
+            pixmap = QtGui.QPixmap.fromImage(image)
+        else:
+            pixmap = loader.toPixmap(loader.loadImage(imagepath, wh, self.diskCache, key[1],
+                                                      trim))
+        if pixmap.isNull():
+            return pixmap
+        return self.pixmapCache.put(key, pixmap)
+
+    # ---------------------------------------------------------
+    # thumbnail : check image is packed in atlas
+    # ---------------------------------------------------------
+    # @param <str>imagepath : image path
+    # @param <int/List>wh   : width and height
+    # @return <bool> : if packed and up to date, True
+    def inAtlas(self, imagepath, wh):
+        if self.partAtlas is None:
+            return False
+        return self.partAtlas.has(self.catalog.getID(imagepath), wh,
+                                  self.catalog.getMtime(imagepath))
+
+    # ---------------------------------------------------------
+    # thumbnail : get scaled size from manifest (without decoding)
+    # ---------------------------------------------------------
+    # @param <str>imagepath : image path
+    # @param <int/List>wh   : width and height
+    # @return <int/List>size : [width, height] (None if unknown)
+    def getManifestSize(self, imagepath, wh):
+        if self.partManifest is None:
+            return None
+        return self.partManifest.getScaledSize(self.catalog.getID(imagepath), wh,
+                                               self.catalog.getMtime(imagepath))
+
+    # ---------------------------------------------------------
+    # thumbnail : get trim of transparent border from manifest
+    # ---------------------------------------------------------
+    # @param <str>imagepath : image path
+    # @param <int/List>wh   : width and height
+    # @return <tuple>trim : (source rect, scaled rect, scaled size) (None : full image)
+    def getTrim(self, imagepath, wh):
+        if not self.trimLayers or self.partManifest is None or not imagepath:
+            return None
+        return self.partManifest.getTrim(self.catalog.getID(imagepath), wh,
+                                         self.catalog.getMtime(imagepath))
+
     # ---------------------------------------------------------
     # pictureWidget : reload picture widget
     # ---------------------------------------------------------
@@ -338,29 +618,298 @@ class toolGUI(object):
     # @param <int/List>wh          : width and height
     # @param <bool>keepGviewTrans  : keep Gview transform
     # @return None
+    @profiler.timed('reloadPicture')
     def reloadPicture(self, imgpathList, parent, wh, keepGviewTrans=False):
-        pixmapList = []
+        jobs = []
+        # layer size known before decoding (None : unknown)
+        sizeList = []
+        # set image (only changed layer)
+        for n, imagepath in enumerate(imgpathList):
+            trim = self.getTrim(imagepath, wh)
+            layerKey = cache.makeKey(imagepath, wh, self.catalog.getMtime(imagepath), trim)
+            # shown entry no longer counts against prefetch budget
+            if self.prefetcher is not None:
+                self.prefetcher.release(layerKey)
+            if self.layerKeys[n] != layerKey:
+                # decode on worker thread
+                if (self.asyncLoad and imagepath and layerKey not in self.pixmapCache and
+                        not self.inAtlas(imagepath, wh)):
+                    jobs.append(((n, layerKey), imagepath, wh, trim))
+                    sizeList.append(self.getManifestSize(imagepath, wh))
+                    continue
+                self.setLayerPixmap(n, layerKey, self.getScaledPixmap(imagepath, wh, trim))
+            sizeList.append(self.layerSizes[n])
+
+        # resize after all layers are loaded
+        self.pendingLayout = (parent, wh, keepGviewTrans)
+        self.pendingLayers = len(jobs)
+        if jobs:
+            if self.prefetcher is not None:
+                self.prefetcher.cancel()
+            self.imageLoader.request(jobs)
+            # layout from manifest before pixel data is read
+            if None not in sizeList:
+                self.fitPicture(parent, wh, keepGviewTrans, sizeList)
+                self.pendingLayout = (parent, wh, True)
+        else:
+            self.imageLoader.cancel()
+            self.updateFlatLayer()
+            self.fitPicture(parent, wh, keepGviewTrans)
+            self.schedulePrefetch()
+
+    # ---------------------------------------------------------
+    # pictureWidget : image loaded on worker thread
+    # ---------------------------------------------------------
+    # @param <int>requestID      : request ID
+    # @param <tuple>tag          : (layer slot, layer key)
+    # @param <QtGui.QImage/diskcache.MappedImage>image : decoded image
+    # @return None
+    def onImageLoaded(self, requestID, tag, image):
+        n, layerKey = tag
+        pixmap = loader.toPixmap(image)
+        if not pixmap.isNull():
+            self.pixmapCache.put(layerKey, pixmap)
+        self.setLayerPixmap(n, layerKey, pixmap)
+        self.pendingLayers -= 1
+        if self.pendingLayers == 0:
+            self.updateFlatLayer()
+            self.fitPicture(*self.pendingLayout)
+            self.schedulePrefetch()
+
+    # ---------------------------------------------------------
+    # pictureWidget : prefetch neighbour items of option menus
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def schedulePrefetch(self):
+        if self.prefetcher is None:
+            return
+        from . import prefetch
+        wh = [self.thumbWidth, self.thumbHeight]
+        # previous / next item first, then parts sharing ID prefix
+        neighbourList = []
+        groupList = []
+        for category in catalog.categories:
+            itemList = self.catalog.getIDs(category)
+            if category == 'hair':
+                itemList += ['None']
+            elif category == 'acce':
+                itemList = ['None'] + itemList
+            value = self.getOptMenuValue(self.getOptMenu(category))
+            neighbours = prefetch.getNeighbours(itemList, value, self.prefetchRadius)
+            neighbourList += neighbours
+            for coordID in [value] + neighbours:
+                groupList += sorted(self.catalog.getGroup(coordID).values())
+        jobs = []
+        pathList = []
+        for coordID in neighbourList + groupList:
+            imagepath = self.catalog.getPath(coordID)
+            if not imagepath or imagepath in pathList or self.inAtlas(imagepath, wh):
+                continue
+            pathList.append(imagepath)
+            trim = self.getTrim(imagepath, wh)
+            key = cache.makeKey(imagepath, wh, self.catalog.getMtime(imagepath), trim)
+            jobs.append((key, imagepath, wh, trim))
+        self.prefetcher.schedule(jobs)
+
+    # ---------------------------------------------------------
+    # pictureWidget : set layer pixmap
+    # ---------------------------------------------------------
+    # @param <int>n                  : layer slot
+    # @param <tuple>layerKey         : layer key (path, mtime, wh[, trim])
+    # @param <QtGui.QPixmap>pixmap   : base pixmap
+    # @return None
+    def setLayerPixmap(self, n, layerKey, pixmap):
+        self.layerKeys[n] = layerKey
+        self.layerBases[n] = pixmap
+        # trimmed layer is placed at offset of alpha rect
+        if len(layerKey) > 3 and not pixmap.isNull():
+            trim = layerKey[3]
+            self.layerItems[n].setPos(trim[1][0], trim[1][1])
+            self.layerSizes[n] = list(trim[2])
+        else:
+            self.layerItems[n].setPos(0, 0)
+            self.layerSizes[n] = [pixmap.width(), pixmap.height()]
+        self.applyLayerLevel(n)
+
+    # ---------------------------------------------------------
+    # pictureWidget : set current level pixmap to layer item
+    # ---------------------------------------------------------
+    # @param <int>n : layer slot
+    # @return None
+    def applyLayerLevel(self, n):
+        base = self.layerBases[n]
+        pixmap = self.getLevelPixmap(n, self.layerKeys[n], base, self.lodLevel)
+        item = self.layerItems[n]
+        with profiler.span('setPixmap'):
+            item.setPixmap(pixmap)
+        if pixmap.width():
+            item.setScale(base.width() / pixmap.width())
+        else:
+            item.setScale(1.0)
+
+    # ---------------------------------------------------------
+    # pictureWidget : get level pixmap (cached)
+    # ---------------------------------------------------------
+    # @param <int>n                : layer slot
+    # @param <tuple>layerKey       : layer key (path, mtime, wh[, trim])
+    # @param <QtGui.QPixmap>base   : base pixmap
+    # @param <float>level          : level
+    # @return <QtGui.QPixmap>pixmap : level pixmap (base until upper level is decoded)
+    def getLevelPixmap(self, n, layerKey, base, level):
+        if level == 1.0 or base.isNull():
+            return base
+        # flattened item is downscaled while painting
+        if level < 1.0 and self.flattenLayers:
+            return base
+        from . import pyramid
+        imagepath, mtime, wh = layerKey[:3]
+        trim = layerKey[3] if len(layerKey) > 3 else None
+        key = cache.makeKey(imagepath, pyramid.levelSize(wh, level), mtime, trim)
+        pixmap = self.pixmapCache.get(key)
+        if pixmap is not None:
+            return pixmap
+        # lower level : downscale base
+        if level < 1.0:
+            return self.pixmapCache.put(key, pyramid.buildLevel(base, wh, level, trim))
+        # upper level : decode source on worker thread
+        if not self.hasLargerSource(imagepath, base, trim):
+            return base
+        levelWh = pyramid.levelSize(wh, level)
+        self.levelJobs[key] = ((n, layerKey, key, level), imagepath, levelWh,
+                               pyramid.levelTrim(trim, level))
+        self.levelTimer.start()
+        return base
+
+    # ---------------------------------------------------------
+    # pictureWidget : check source is larger than base (by manifest)
+    # ---------------------------------------------------------
+    # @param <str>imagepath      : image path
+    # @param <QtGui.QPixmap>base : base pixmap
+    # @param <tuple>trim         : trim (None : full image)
+    # @return <bool> : if larger or unknown, True
+    def hasLargerSource(self, imagepath, base, trim=None):
+        if self.partManifest is None:
+            return True
+        part = self.partManifest.get(self.catalog.getID(imagepath),
+                                     self.catalog.getMtime(imagepath))
+        if part is None:
+            return True
+        if trim is not None:
+            width, height = trim[0][2:]
+        else:
+            width, height = part['size']
+        return max(width, height) > max(base.width(), base.height())
+
+    # ---------------------------------------------------------
+    # pictureWidget : request upper level decoding (once per event loop)
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def flushLevelJobs(self):
+        # drop jobs of replaced layer or level
+        for key, job in list(self.levelJobs.items()):
+            n, layerKey, levelKey, level = job[0]
+            if self.layerKeys[n] != layerKey or self.lodLevel != level:
+                del self.levelJobs[key]
+        if self.levelJobs:
+            self.levelLoader.request(list(self.levelJobs.values()))
+        else:
+            self.levelLoader.cancel()
+
+    # ---------------------------------------------------------
+    # pictureWidget : upper level decoded on worker thread
+    # ---------------------------------------------------------
+    # @param <int>requestID : request ID
+    # @param <tuple>tag     : (layer slot, layer key, level key, level)
+    # @param <QtGui.QImage/diskcache.MappedImage>image : decoded image
+    # @return None
+    def onLevelLoaded(self, requestID, tag, image):
+        n, layerKey, levelKey, level = tag
+        self.levelJobs.pop(levelKey, None)
+        pixmap = loader.toPixmap(image)
+        if self.layerKeys[n] != layerKey or self.lodLevel != level:
+            return
+        # failed level is not requested again until layer or level is changed
+        if not pixmap.isNull():
+            self.pixmapCache.put(levelKey, pixmap)
+            self.applyLayerLevel(n)
+        if not self.levelJobs:
+            self.updateFlatLayer()
+
+    # ---------------------------------------------------------
+    # pictureWidget : view scale changed
+    # ---------------------------------------------------------
+    # @param <float>scale : view scale
+    # @return None
+    def onViewScaled(self, scale):
+        if self.useLod:
+            from . import pyramid
+            level = pyramid.chooseLevel(scale, self.lodLevels or pyramid.levels)
+        else:
+            level = 1.0
+        if level == self.lodLevel:
+            return
+        self.lodLevel = level
+        for n in range(len(self.layerItems)):
+            self.applyLayerLevel(n)
+        self.updateFlatLayer()
+
+    # ---------------------------------------------------------
+    # pictureWidget : update flattened composite layer
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def updateFlatLayer(self):
+        if not self.flattenLayers:
+            self.flatItem.hide()
+            for item in self.layerItems:
+                item.show()
+            return
+        key = (tuple(self.layerKeys), self.lodLevel)
+        flat = self.compositeCache.get(key)
+        if flat is None:
+            from . import composite
+            with profiler.span('composite.flatten'):
+                flat = composite.flattenItems(self.layerItems, self.lodLevel)
+            # not cached while upper levels are decoding (base pixmap is drawn)
+            if not self.levelJobs:
+                self.compositeCache.put(key, flat, cache.imageBytes(flat[0]))
+        self.flatItem.setPixmap(flat[0])
+        self.flatItem.setOffset(flat[1])
+        self.flatItem.setScale(1.0 / self.lodLevel)
+        self.flatItem.show()
+        for item in self.layerItems:
+            item.hide()
+
+    # ---------------------------------------------------------
+    # pictureWidget : fit view and layout to picture
+    # ---------------------------------------------------------
+    # @param <obj>parent           : parent Layout
+    # @param <int/List>wh          : width and height
+    # @param <bool>keepGviewTrans  : keep Gview transform
+    # @param <int/List>sizeList    : layer sizes (None : current layer sizes)
+    # @return None
+    @profiler.timed('fitPicture')
+    def fitPicture(self, parent, wh, keepGviewTrans=False, sizeList=None):
         gView = self.coordGView
         thumbScn = self.coordThumbScene
 
-        # resize
-        for imagepath in imgpathList:
-            pixmap = QtGui.QPixmap(imagepath)
-            picWidth = pixmap.size().width()
-            picHeight = pixmap.size().height()
+        if sizeList is None:
+            sizeList = self.layerSizes
+        xsize, ysize = wh
+        scale = 1.0
+        for picWidth, picHeight in sizeList:
             if picWidth == 0:
                 pass
             elif picWidth > picHeight:
-                pixmap = pixmap.scaledToWidth(wh[0])
                 xsize = wh[0]
-                ysize = pixmap.size().height()
-                scale = (wh[0] - 16) / pixmap.size().width()
+                ysize = picHeight
+                scale = (wh[0] - 16) / picWidth
             else:
-                pixmap = pixmap.scaledToHeight(wh[1])
-                xsize = pixmap.size().width()
+                xsize = picWidth
                 ysize = wh[1]
-                scale = (wh[1] - 8) / pixmap.size().height()
-            pixmapList.append(pixmap)
+                scale = (wh[1] - 8) / picHeight
         if keepGviewTrans is False:
             gView.resetTransform()
             gView.scale(scale, scale)
@@ -368,16 +917,42 @@ class toolGUI(object):
         if keepGviewTrans is False:
             gView.resize(wh[0], ysize)
             gView.translate(colWidth, 0)
-        thumbScn.setSceneRect(0, 0, xsize, ysize)
-        cmds.columnLayout(parent, e=True, h=ysize)
+        if self.sceneSize != (xsize, ysize):
+            thumbScn.setSceneRect(0, 0, xsize, ysize)
+            cmds.columnLayout(parent, e=True, h=ysize)
+            self.sceneSize = (xsize, ysize)
         gView.update()
+        self.onViewScaled(gView.transform().m11())
 
-        # set image
-        bgimgList = self.getImgItemFromScn(thumbScn)
-        for n, pixmap in enumerate(pixmapList):
-            bgimgList[n].setPixmap(pixmap)
+    # ---------------------------------------------------------
+    # browser : show part browser
+    # ---------------------------------------------------------
+    # @param <str>category : part category
+    # @return None
+    def showPartBrowser(self, category, *args):
+        partBrowser = self.partBrowsers.get(category)
+        if partBrowser is None:
+            from . import browser
+            parent = mayaToPySide(self.windowName, QtWidgets.QWidget)
+            partBrowser = browser.PartBrowser(self.catalog, category, self.diskCache, parent)
+            partBrowser.partSelected.connect(self.onPartSelected)
+            self.partBrowsers[category] = partBrowser
+        partBrowser.show()
+        partBrowser.raise_()
+
+    # ---------------------------------------------------------
+    # browser : part selected in browser
+    # ---------------------------------------------------------
+    # @param <str>category : part category
+    # @param <str>coordID  : coordinate ID
+    # @return None
+    def onPartSelected(self, category, coordID):
+        if not self.selectOptMenuItem(self.getOptMenu(category), coordID):
+            return
+        if category in ('body', 'leg'):
+            self.ui_action(1)
         else:
-            bgimgList[0].setPixmap(pixmapList[0])
+            self.ui_action(0)
 
     # ---------------------------------------------------------
     # UI : coord frame layout
@@ -400,21 +975,16 @@ class toolGUI(object):
                                         p=coordMenuformLayout)
         self.acceOMenu = cmds.optionMenu(cc=lambda *args: self.ui_action(0), w=self.oMenuWidth,
                                          p=coordMenuformLayout)
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.hairOMenu, 'top', 12])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.hairOMenu, 'left', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.hairOMenu, 'right', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, ac=[self.headOMenu, 'top', 34, self.hairOMenu])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.headOMenu, 'left', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.headOMenu, 'right', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, ac=[self.bodyOMenu, 'top', 34, self.headOMenu])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.bodyOMenu, 'left', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.bodyOMenu, 'right', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, ac=[self.legOMenu, 'top', 34, self.bodyOMenu])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.legOMenu, 'left', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.legOMenu, 'right', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, ac=[self.acceOMenu, 'top', 34, self.legOMenu])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.acceOMenu, 'left', 4])
-        cmds.formLayout(coordMenuformLayout, e=True, af=[self.acceOMenu, 'right', 4])
+        # attach in one command
+        oMenuList = [self.hairOMenu, self.headOMenu, self.bodyOMenu, self.legOMenu,
+                     self.acceOMenu]
+        attachForm = [(self.hairOMenu, 'top', 12)]
+        attachControl = []
+        for n, oMenu in enumerate(oMenuList):
+            attachForm += [(oMenu, 'left', 4), (oMenu, 'right', 4)]
+            if n:
+                attachControl.append((oMenu, 'top', 34, oMenuList[n - 1]))
+        cmds.formLayout(coordMenuformLayout, e=True, af=attachForm, ac=attachControl)
         cmds.setParent(coordThumbformLayout)
         # # thumbnail row
         self.coordThumbnailLayout = cmds.columnLayout(adj=True, p=coordThumbformLayout)
@@ -422,46 +992,77 @@ class toolGUI(object):
         # self.coordGView = QtWidgets.QGraphicsView()
         self.coordGView = GraphView(thumbLayoutPyside)
         # self.coordGView.setParent(thumbLayoutPyside)
+        self.coordGView.scaleChanged.connect(self.onViewScaled)
         self.coordThumbScene = QtWidgets.QGraphicsScene()
         self.coordThumbScene.clear()
-        self.coordThumbScene.addPixmap(QtGui.QPixmap())
-        self.coordThumbScene.addPixmap(QtGui.QPixmap())
-        self.coordThumbScene.addPixmap(QtGui.QPixmap())
-        self.coordThumbScene.addPixmap(QtGui.QPixmap())
-        self.coordThumbScene.addPixmap(QtGui.QPixmap())
-        self.coordThumbScene.addPixmap(QtGui.QPixmap())
+        # layer slot : pixmap item
+        self.layerItems = []
+        for n in range(len(self.layerNames)):
+            item = self.coordThumbScene.addPixmap(QtGui.QPixmap())
+            # front slot has larger z value
+            item.setZValue(len(self.layerNames) - n)
+            self.layerItems.append(item)
+        # flattened composite
+        self.flatItem = self.coordThumbScene.addPixmap(QtGui.QPixmap())
+        self.flatItem.setZValue(len(self.layerNames) + 1)
+        self.flatItem.hide()
+        self.layerKeys = [None] * len(self.layerNames)
+        self.layerBases = [QtGui.QPixmap()] * len(self.layerNames)
+        # untrimmed scaled size of layer
+        self.layerSizes = [[0, 0]] * len(self.layerNames)
+        self.lodLevel = 1.0
+        self.sceneSize = None
+        self.pendingLayers = 0
+        self.pendingLayout = None
+        # loaders are stopped and atlas is closed when window is deleted
+        windowWidget = mayaToPySide(self.windowName, QtWidgets.QWidget)
+        windowWidget.destroyed.connect(self.closeAtlas)
+        self.imageLoader = loader.ImageLoader(self.loaderThreads, self.diskCache, windowWidget)
+        self.imageLoader.loaded.connect(self.onImageLoaded)
+        # upper level of detail (level key : job)
+        self.levelJobs = {}
+        self.levelLoader = loader.ImageLoader(1, self.diskCache, windowWidget)
+        self.levelLoader.loaded.connect(self.onLevelLoaded)
+        self.levelTimer = QtCore.QTimer(windowWidget)
+        self.levelTimer.setSingleShot(True)
+        self.levelTimer.setInterval(0)
+        self.levelTimer.timeout.connect(self.flushLevelJobs)
+        if self.usePrefetch:
+            from . import prefetch
+            self.prefetcher = prefetch.Prefetcher(self.pixmapCache, self.diskCache,
+                                                  self.prefetchMaxJobs, parent=windowWidget)
+        else:
+            self.prefetcher = None
         self.coordGView.setScene(self.coordThumbScene)
         cmds.setParent(coordThumbformLayout)
         # # layout
-        cmds.formLayout(coordThumbformLayout, e=True, af=[coordMenuformLayout, 'top', 4])
-        cmds.formLayout(coordThumbformLayout, e=True, af=[coordMenuformLayout, 'left', 4])
-        cmds.formLayout(coordThumbformLayout, e=True, af=[self.coordThumbnailLayout, 'top', 4])
         cmds.formLayout(coordThumbformLayout, e=True,
-                        ac=[self.coordThumbnailLayout, 'left', 8, coordMenuformLayout])
-        cmds.formLayout(coordThumbformLayout, e=True,
-                        af=[self.coordThumbnailLayout, 'right', 4])
+                        af=[(coordMenuformLayout, 'top', 4),
+                            (coordMenuformLayout, 'left', 4),
+                            (self.coordThumbnailLayout, 'top', 4),
+                            (self.coordThumbnailLayout, 'right', 4)],
+                        ac=[(self.coordThumbnailLayout, 'left', 8, coordMenuformLayout)])
         cmds.setParent(coordformLayout)
 
         # run Btn row
         runbtnformLayout = cmds.formLayout(parent=coordformLayout)
         loadRigBtn = cmds.button(l='Coordinate', h=40, bgc=self.runBtnCol,
                                  c=lambda *args: self.do_button())
-        cmds.formLayout(runbtnformLayout, e=True, af=[loadRigBtn, 'left', 8])
-        cmds.formLayout(runbtnformLayout, e=True, af=[loadRigBtn, 'right', 8])
-        cmds.formLayout(runbtnformLayout, e=True, af=[loadRigBtn, 'bottom', 4])
+        cmds.formLayout(runbtnformLayout, e=True,
+                        af=[(loadRigBtn, 'left', 8), (loadRigBtn, 'right', 8),
+                            (loadRigBtn, 'bottom', 4)])
         cmds.setParent(coordformLayout)
 
         # coord frame formLayout
         thumbnailLayoutSpace = 0
-        cmds.formLayout(coordformLayout, e=True, ap=[coordThumbformLayout, 'top', 0, 0])
-        cmds.formLayout(coordformLayout, e=True,
-                        af=[coordThumbformLayout, 'left', thumbnailLayoutSpace])
-        cmds.formLayout(coordformLayout, e=True, af=[coordThumbformLayout, 'right', 0])
         cmds.formLayout(coordformLayout, e=True,
-                        ac=[runbtnformLayout, 'top', 4, coordThumbformLayout])
-        cmds.formLayout(coordformLayout, e=True, af=[runbtnformLayout, 'left', 0])
-        cmds.formLayout(coordformLayout, e=True, af=[runbtnformLayout, 'right', 0])
-        cmds.formLayout(coordformLayout, e=True, af=[runbtnformLayout, 'bottom', 0])
+                        ap=[(coordThumbformLayout, 'top', 0, 0)],
+                        af=[(coordThumbformLayout, 'left', thumbnailLayoutSpace),
+                            (coordThumbformLayout, 'right', 0),
+                            (runbtnformLayout, 'left', 0),
+                            (runbtnformLayout, 'right', 0),
+                            (runbtnformLayout, 'bottom', 0)],
+                        ac=[(runbtnformLayout, 'top', 4, coordThumbformLayout)])
 
     # ---------------------------------------------------------
     # UI : build coord Tab layout
@@ -483,6 +1084,10 @@ class toolGUI(object):
     def show(self):
         windowlayout = cmds.window(self.windowName, title=self.windowTitle,
                                    iconName=self.icName, menuBar=True)
+        # part browser menu
+        cmds.menu(label='Browse')
+        for category in catalog.categories:
+            cmds.menuItem(label=category, c=functools.partial(self.showPartBrowser, category))
         # window layout
         allformLayout = cmds.formLayout()
         self.alltabLayout = cmds.tabLayout(p=allformLayout)
@@ -492,15 +1097,23 @@ class toolGUI(object):
         cmds.tabLayout(self.alltabLayout, e=True,
                         tabLabel=((coordTabcLayout, self.tabName[0])))
         # all form
-        cmds.formLayout(allformLayout, e=True, af=[self.alltabLayout, 'top', 0])
-        cmds.formLayout(allformLayout, e=True, af=[self.alltabLayout, 'left', 0])
-        cmds.formLayout(allformLayout, e=True, af=[self.alltabLayout, 'right', 0])
-        cmds.formLayout(allformLayout, e=True, af=[self.alltabLayout, 'bottom', 0])
+        cmds.formLayout(allformLayout, e=True,
+                        af=[(self.alltabLayout, 'top', 0), (self.alltabLayout, 'left', 0),
+                            (self.alltabLayout, 'right', 0), (self.alltabLayout, 'bottom', 0)])
         cmds.setParent('..')
         cmds.showWindow()
-
-        self.reloadAllOptMenu()
         cmds.window(self.windowName, e=True, w=self.defWidth, h=self.defHeight)
+        # watcher is deleted with window
+        if self.watchThumbnails:
+            from . import watcher
+            self.thumbWatcher = watcher.DirectoryWatcher(
+                self.thumbnailPath, self.watchInterval, usePolling=self.watchPolling,
+                parent=mayaToPySide(self.windowName, QtWidgets.QWidget))
+            self.thumbWatcher.changed.connect(self.onThumbnailsChanged)
+            self.thumbWatcher.start()
+
+        # thumbnail is loaded after first paint
+        self.reloadAllOptMenu(deferLoad=True)
 
     # ---------------------------------------------------------
     # UI action
@@ -528,6 +1141,4 @@ class toolGUI(object):
 
 # import sys
 # sys.path.append(r'E:\_gonokami\scripts\python\maya\tools\tool_git')
-# import coordUI.gui as ccgui;reload(ccgui)
-# gui = ccgui.toolGUI()
-# gui.show()
+# import coordUI;coordUI.show()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  background image loader
+#  @file   loader.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+import threading
+
+from PySide2 import QtGui
+from PySide2 import QtCore
+
+from . import cache
+from . import profiler
+
+
+# ---------------------------------------------------------
+# scale image to fit width or height
+# ---------------------------------------------------------
+# @param <QImage/QPixmap>image          : image
+# @param <int/List>wh                   : width and height
+# @param <QtCore.Qt.TransformationMode>mode : transformation mode
+# @return <QImage/QPixmap>image : scaled image
+def scaleToFit(image, wh, mode=QtCore.Qt.FastTransformation):
+    picWidth = image.size().width()
+    picHeight = image.size().height()
+    if picWidth == 0:
+        return image
+    elif picWidth > picHeight:
+        return image.scaledToWidth(wh[0], mode)
+    else:
+        return image.scaledToHeight(wh[1], mode)
+
+
+# ---------------------------------------------------------
+# decode and scale image (thread safe)
+# ---------------------------------------------------------
+# @param <str>imagepath : image path
+# @param <int/List>wh   : width and height
+# @param <tuple>trim    : (source rect, scaled rect, scaled size) (None : full image)
+# @return <QtGui.QImage>image : scaled image
+def decodeImage(imagepath, wh, trim=None):
+    with profiler.span('decode'):
+        image = QtGui.QImage(imagepath)
+    if image.isNull():
+        return image
+    with profiler.span('scale'):
+        if trim is None:
+            image = scaleToFit(image, wh)
+        else:
+            # crop transparent border, then scale by same ratio as full image
+            image = image.copy(*trim[0]).scaled(trim[1][2], trim[1][3],
+                                                QtCore.Qt.IgnoreAspectRatio,
+                                                QtCore.Qt.FastTransformation)
+        # premultiplied format is converted to pixmap without copy on most platform
+        return image.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+
+
+# ---------------------------------------------------------
+# load image from disk cache or decode (thread safe)
+# ---------------------------------------------------------
+# @param <str>imagepath             : image path
+# @param <int/List>wh               : width and height
+# @param <diskcache.DiskCache>diskCache : disk cache (None : not use)
+# @param <float>mtime               : modified time (None : get from file)
+# @param <tuple>trim                : trim (None : full image)
+# @return <QtGui.QImage/diskcache.MappedImage>image : scaled image
+def loadImage(imagepath, wh, diskCache=None, mtime=None, trim=None):
+    if diskCache is None:
+        return decodeImage(imagepath, wh, trim)
+    key = cache.makeKey(imagepath, wh, mtime, trim)
+    mapped = diskCache.load(key)
+    if mapped is not None:
+        return mapped
+    image = decodeImage(imagepath, wh, trim)
+    diskCache.save(key, image)
+    return image
+
+
+# ---------------------------------------------------------
+# convert loaded image to pixmap (GUI thread)
+# ---------------------------------------------------------
+# @param <QtGui.QImage/diskcache.MappedImage>image : loaded image
+# @return <QtGui.QPixmap>pixmap : pixmap
+def toPixmap(image):
+    with profiler.span('toPixmap'):
+        if isinstance(image, QtGui.QImage):
+            return QtGui.QPixmap.fromImage(image)
+        return image.toPixmap()
+
+
+# ---------------------------------------------------------
+# decode task
+# ---------------------------------------------------------
+class DecodeTask(QtCore.QRunnable):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <ImageLoader>loader : loader
+    # @param <int>requestID      : request ID
+    # @param <obj>tag            : tag passed to loaded signal
+    # @param <str>imagepath      : image path
+    # @param <int/List>wh        : width and height
+    # @param <tuple>trim         : trim (None : full image)
+    # @return None
+    def __init__(self, loader, requestID, tag, imagepath, wh, trim=None):
+        super(DecodeTask, self).__init__()
+        self.loader = loader
+        self.requestID = requestID
+        self.tag = tag
+        self.imagepath = imagepath
+        self.wh = wh
+        self.trim = trim
+
+    # ---------------------------------------------------------
+    # run (worker thread)
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def run(self):
+        if self.loader.isStale(self.requestID):
+            return
+        image = loadImage(self.imagepath, self.wh, self.loader.diskCache, trim=self.trim)
+        if self.loader.isStale(self.requestID):
+            if not isinstance(image, QtGui.QImage):
+                image.close()
+            return
+        try:
+            self.loader.decoded.emit(self.requestID, self.tag, image)
+        except RuntimeError:
+            # loader is deleted while decoding
+            if not isinstance(image, QtGui.QImage):
+                image.close()
+
+
+# ---------------------------------------------------------
+# image loader (latest request wins)
+# ---------------------------------------------------------
+class ImageLoader(QtCore.QObject):
+    # (requestID, tag, QImage/MappedImage) : emitted on worker thread
+    decoded = QtCore.Signal(int, object, object)
+    # (requestID, tag, QImage/MappedImage) : emitted on GUI thread
+    loaded = QtCore.Signal(int, object, object)
+
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <int>maxThreads              : max worker thread count
+    # @param <diskcache.DiskCache>diskCache : disk cache (None : not use)
+    # @param <obj>parent                  : parent
+    # @return None
+    def __init__(self, maxThreads=None, diskCache=None, parent=None):
+        super(ImageLoader, self).__init__(parent)
+        self.diskCache = diskCache
+        self.pool = QtCore.QThreadPool(self)
+        if maxThreads:
+            self.pool.setMaxThreadCount(maxThreads)
+        self.requestID = 0
+        self._lock = threading.Lock()
+        self.decoded.connect(self.onDecoded, QtCore.Qt.QueuedConnection)
+        # stop workers before parent deletes loader
+        if parent is not None:
+            parent.destroyed.connect(self.shutdown)
+
+    # ---------------------------------------------------------
+    # decoded (GUI thread)
+    # ---------------------------------------------------------
+    # @param <int>requestID      : request ID
+    # @param <obj>tag            : tag
+    # @param <QtGui.QImage/diskcache.MappedImage>image : decoded image
+    # @return None
+    @QtCore.Slot(int, object, object)
+    def onDecoded(self, requestID, tag, image):
+        if self.isStale(requestID):
+            if not isinstance(image, QtGui.QImage):
+                image.close()
+            return
+        self.loaded.emit(requestID, tag, image)
+
+    # ---------------------------------------------------------
+    # check request is superseded
+    # ---------------------------------------------------------
+    # @param <int>requestID : request ID
+    # @return <bool> : if stale, True
+    def isStale(self, requestID):
+        with self._lock:
+            return requestID != self.requestID
+
+    # ---------------------------------------------------------
+    # request decoding (previous requests are cancelled)
+    # ---------------------------------------------------------
+    # @param <tuple/List>jobs : (tag, imagepath, wh[, trim])
+    # @return <int>requestID : request ID
+    def request(self, jobs):
+        requestID = self.cancel()
+        for job in jobs:
+            self.pool.start(DecodeTask(self, requestID, *job))
+        return requestID
+
+    # ---------------------------------------------------------
+    # cancel all requests
+    # ---------------------------------------------------------
+    # @param None
+    # @return <int>requestID : new request ID
+    def cancel(self):
+        with self._lock:
+            self.requestID += 1
+            requestID = self.requestID
+        # drop tasks not started yet
+        self.pool.clear()
+        return requestID
+
+    # ---------------------------------------------------------
+    # cancel all requests and wait for running tasks
+    # ---------------------------------------------------------
+    # @param <obj>args : destroyed signal arguments
+    # @return None
+    def shutdown(self, *args):
+        self.cancel()
+        self.wait()
+
+    # ---------------------------------------------------------
+    # wait for all running tasks
+    # ---------------------------------------------------------
+    # @param <int>msecs : timeout (-1 : no timeout)
+    # @return <bool> : if all tasks done, True
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  catalog manifest (image metadata without decoding)
+#  @file   manifest.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+#  [format]\n
+#  json : {version, parts : {coordID : {file, category, mtime, size, bbox, hash}}}\n
+#  size : [width, height] of source image\n
+#  bbox : [x, y, width, height] of non transparent pixels (empty : [0, 0, 0, 0])\n
+#
+# #########################################################
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import json
+import os
+import sys
+
+from . import catalog
+from . import profiler
+
+
+manifestVersion = 1
+defManifestName = 'manifest.json'
+
+
+# ---------------------------------------------------------
+# get content hash of file
+# ---------------------------------------------------------
+# @param <str>path : file path
+# @return <str>digest : sha1 hex digest
+def getFileHash(path):
+    sha = hashlib.sha1()
+    f = open(path, 'rb')
+    with f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# ---------------------------------------------------------
+# get bounding rect of non transparent pixels
+# ---------------------------------------------------------
+# @param <QtGui.QImage>image : image
+# @return <int/List>rect : [x, y, width, height]
+def getAlphaRect(image):
+    from PySide2 import QtGui
+    image = image.convertToFormat(QtGui.QImage.Format_ARGB32)
+    width = image.width()
+    height = image.height()
+    bpl = image.bytesPerLine()
+    data = bytes(image.constBits())[:bpl * height]
+    # alpha is 4th byte of each pixel (BGRA on little endian)
+    alphaOffset = 3 if sys.byteorder == 'little' else 0
+    left = width
+    right = 0
+    top = None
+    bottom = 0
+    for y in range(height):
+        start = y * bpl + alphaOffset
+        alpha = data[start:start + width * 4:4]
+        stripped = alpha.rstrip(b'\0')
+        if not stripped:
+            continue
+        if top is None:
+            top = y
+        bottom = y + 1
+        right = max(right, len(stripped))
+        left = min(left, width - len(alpha.lstrip(b'\0')))
+    if top is None:
+        return [0, 0, 0, 0]
+    return [left, top, right - left, bottom - top]
+
+
+# ---------------------------------------------------------
+# inspect image (size, alpha rect)
+# ---------------------------------------------------------
+# @param <str>path : image path
+# @return <dict>info : {size, bbox} (None if not image)
+def inspectImage(path):
+    from PySide2 import QtGui
+    image = QtGui.QImage(path)
+    if image.isNull():
+        return None
+    if image.hasAlphaChannel():
+        bbox = getAlphaRect(image)
+    else:
+        bbox = [0, 0, image.width(), image.height()]
+    return {'size': [image.width(), image.height()], 'bbox': bbox}
+
+
+# ---------------------------------------------------------
+# open manifest (empty if not exists)
+# ---------------------------------------------------------
+# @param <str>manifestPath : manifest path
+# @return <Manifest>manifest : manifest
+def openManifest(manifestPath):
+    partManifest = Manifest(manifestPath)
+    partManifest.load()
+    return partManifest
+
+
+# ---------------------------------------------------------
+# manifest
+# ---------------------------------------------------------
+class Manifest(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <str>manifestPath : manifest path
+    # @return None
+    def __init__(self, manifestPath):
+        self.path = manifestPath
+        # coordID : part info
+        self.parts = {}
+
+    # ---------------------------------------------------------
+    # load manifest file
+    # ---------------------------------------------------------
+    # @param None
+    # @return <bool> : if loaded, True
+    def load(self):
+        self.parts = {}
+        try:
+            f = open(self.path, 'r')
+            with f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        if data.get('version') != manifestVersion:
+            return False
+        self.parts = data.get('parts', {})
+        return True
+
+    # ---------------------------------------------------------
+    # save manifest file
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def save(self):
+        tmpPath = '%s.%d.tmp' % (self.path, os.getpid())
+        f = open(tmpPath, 'w')
+        with f:
+            json.dump({'version': manifestVersion, 'parts': self.parts}, f,
+                      indent=1, sort_keys=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmpPath, self.path)
+
+    # ---------------------------------------------------------
+    # refresh changed parts (compared by mtime, then content hash)
+    # ---------------------------------------------------------
+    # @param <catalog.Catalog>partCatalog : scanned catalog
+    # @return <int>count : updated part count
+    @profiler.timed('manifest.refresh')
+    def refresh(self, partCatalog):
+        partCatalog.ensureScanned()
+        count = 0
+        for coordID in [c for c in self.parts if c not in partCatalog.pathDict]:
+            del self.parts[coordID]
+            count += 1
+        for coordID, path in partCatalog.pathDict.items():
+            mtime = partCatalog.getMtime(path)
+            name = os.path.basename(path)
+            part = self.parts.get(coordID)
+            if part is not None and part['mtime'] == mtime and part['file'] == name:
+                continue
+            digest = getFileHash(path)
+            if part is None or part['hash'] != digest:
+                info = inspectImage(path)
+                if info is None:
+                    self.parts.pop(coordID, None)
+                    continue
+                part = dict(info)
+            part.update({'file': name, 'category': catalog.getCategory(name),
+                         'mtime': mtime, 'hash': digest})
+            self.parts[coordID] = part
+            count += 1
+        if count:
+            self.save()
+        return count
+
+    # ---------------------------------------------------------
+    # get part info
+    # ---------------------------------------------------------
+    # @param <str>coordID : coordinate ID
+    # @param <float>mtime : modified time (None : not check)
+    # @return <dict>part : part info (None if not listed or old)
+    def get(self, coordID, mtime=None):
+        part = self.parts.get(coordID)
+        if part is None or (mtime is not None and part['mtime'] != mtime):
+            return None
+        return part
+
+    # ---------------------------------------------------------
+    # get scaled size (same rule as loader.scaleToFit)
+    # ---------------------------------------------------------
+    # @param <str>coordID : coordinate ID
+    # @param <int/List>wh : width and height
+    # @param <float>mtime : modified time (None : not check)
+    # @return <int/List>size : [width, height] (None if not listed or old)
+    def getScaledSize(self, coordID, wh, mtime=None):
+        part = self.get(coordID, mtime)
+        if part is None:
+            return None
+        width, height = part['size']
+        if width == 0:
+            return [0, 0]
+        elif width > height:
+            return [wh[0], int(height * wh[0] / width + 0.5)]
+        else:
+            return [int(width * wh[1] / height + 0.5), wh[1]]
+
+    # ---------------------------------------------------------
+    # get trim of transparent border
+    # ---------------------------------------------------------
+    # @param <str>coordID : coordinate ID
+    # @param <int/List>wh : width and height
+    # @param <float>mtime : modified time (None : not check)
+    # @return <tuple>trim : (source rect, scaled rect, scaled size) (None : not trimmed)
+    def getTrim(self, coordID, wh, mtime=None):
+        part = self.get(coordID, mtime)
+        if part is None:
+            return None
+        width, height = part['size']
+        x, y, w, h = part['bbox']
+        if w == 0 or h == 0 or (w == width and h == height):
+            return None
+        if width > height:
+            ratio = wh[0] / width
+        else:
+            ratio = wh[1] / height
+        rect = (x * ratio, y * ratio, max(1, int(w * ratio + 0.5)), max(1, int(h * ratio + 0.5)))
+        return ((x, y, w, h), rect, tuple(self.getScaledSize(coordID, wh, mtime)))
+
+
+# ----------------------------------------------------------------------------
+if __name__ == '__main__':
+    # python -m coordUI.manifest <imgDir>
+    imgDir = sys.argv[1].replace('\\', '/')
+    partManifest = openManifest(imgDir + '/' + defManifestName)
+    count = partManifest.refresh(catalog.Catalog(imgDir))
+    print("# refresh manifest : %d part(s) updated #" % count)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  idle time thumbnail prefetcher
+#  @file   prefetch.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+from PySide2 import QtGui
+from PySide2 import QtCore
+
+from . import cache
+from . import loader
+
+
+# ---------------------------------------------------------
+# get neighbour items (nearest first)
+# ---------------------------------------------------------
+# @param <List>itemList : item list
+# @param <obj>value     : current item
+# @param <int>radius    : neighbour count on each side
+# @return <List>neighbourList : neighbour items
+def getNeighbours(itemList, value, radius=1):
+    if value not in itemList:
+        return []
+    index = itemList.index(value)
+    neighbourList = []
+    for n in range(1, radius + 1):
+        for i in (index + n, index - n):
+            if 0 <= i < len(itemList) and itemList[i] not in neighbourList:
+                neighbourList.append(itemList[i])
+    return neighbourList
+
+
+# ---------------------------------------------------------
+# prefetcher (decode into pixmap cache while idle)
+# ---------------------------------------------------------
+class Prefetcher(QtCore.QObject):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <cache.LRUCache>pixmapCache    : pixmap cache
+    # @param <diskcache.DiskCache>diskCache : disk cache (None : not use)
+    # @param <int>maxJobs                   : max decode count per schedule
+    # @param <float>budgetRatio             : usable ratio of cache budget
+    # @param <int>delay                     : idle wait (msec)
+    # @param <obj>parent                    : parent
+    # @return None
+    def __init__(self, pixmapCache, diskCache=None, maxJobs=16, budgetRatio=0.5,
+                 delay=150, parent=None):
+        super(Prefetcher, self).__init__(parent)
+        self.pixmapCache = pixmapCache
+        self.maxJobs = maxJobs
+        self.budgetRatio = budgetRatio
+        self.pendingJobs = []
+        self.loadedCount = 0
+        # bytes of entries inserted by prefetcher {key : nbytes}
+        self.prefetched = {}
+        # single worker not to compete with foreground loader
+        self.imageLoader = loader.ImageLoader(1, diskCache, self)
+        self.imageLoader.loaded.connect(self.onLoaded)
+        self.idleTimer = QtCore.QTimer(self)
+        self.idleTimer.setSingleShot(True)
+        self.idleTimer.setInterval(delay)
+        self.idleTimer.timeout.connect(self.start)
+
+    # ---------------------------------------------------------
+    # get remaining byte budget (prefetched entries only)
+    # ---------------------------------------------------------
+    # @param None
+    # @return <int>nbytes : remaining bytes
+    def getBudget(self):
+        # forget entries evicted or invalidated in cache
+        for key in [k for k in self.prefetched if k not in self.pixmapCache]:
+            del self.prefetched[key]
+        return int(self.pixmapCache.maxBytes * self.budgetRatio) - sum(self.prefetched.values())
+
+    # ---------------------------------------------------------
+    # release prefetched entry (used in foreground)
+    # ---------------------------------------------------------
+    # @param <tuple>key : cache key
+    # @return None
+    def release(self, key):
+        self.prefetched.pop(key, None)
+
+    # ---------------------------------------------------------
+    # schedule prefetch (started after idle wait)
+    # ---------------------------------------------------------
+    # @param <tuple/List>jobs : (key, imagepath, wh[, trim]) most likely first
+    # @return None
+    def schedule(self, jobs):
+        self.cancel()
+        self.pendingJobs = list(jobs)
+        self.idleTimer.start()
+
+    # ---------------------------------------------------------
+    # cancel scheduled and running prefetch
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def cancel(self):
+        self.idleTimer.stop()
+        self.pendingJobs = []
+        self.imageLoader.cancel()
+
+    # ---------------------------------------------------------
+    # start scheduled prefetch
+    # ---------------------------------------------------------
+    # @param None
+    # @return <int>count : requested count
+    def start(self):
+        budget = self.getBudget()
+        jobs = []
+        for job in self.pendingJobs:
+            if len(jobs) >= self.maxJobs:
+                break
+            key, imagepath, wh = job[:3]
+            if key in self.pixmapCache:
+                continue
+            # estimate by target size (ARGB32)
+            budget -= wh[0] * wh[1] * 4
+            if budget < 0:
+                break
+            jobs.append(job)
+        self.pendingJobs = []
+        if jobs:
+            self.imageLoader.request(jobs)
+        return len(jobs)
+
+    # ---------------------------------------------------------
+    # image loaded
+    # ---------------------------------------------------------
+    # @param <int>requestID : request ID
+    # @param <tuple>key     : cache key
+    # @param <QtGui.QImage/diskcache.MappedImage>image : decoded image
+    # @return None
+    def onLoaded(self, requestID, key, image):
+        if key in self.pixmapCache:
+            if not isinstance(image, QtGui.QImage):
+                image.close()
+            return
+        pixmap = loader.toPixmap(image)
+        nbytes = cache.imageBytes(pixmap)
+        if pixmap.isNull() or nbytes > self.getBudget():
+            return
+        self.pixmapCache.put(key, pixmap, nbytes)
+        if key in self.pixmapCache:
+            self.prefetched[key] = nbytes
+        self.loadedCount += 1
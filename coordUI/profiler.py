@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  stage timing instrumentation (opt-in)
+#  @file   profiler.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+#  [usage]\n
+#  import coordUI.profiler as prof; prof.enable()\n
+#  ... use coordinate window ...\n
+#  prof.printSummary(); prof.dumpTrace('C:/tmp/coord_trace.json')\n
+#  (set COORDUI_PROFILE=1 to enable on import)\n
+#
+# #########################################################
+from __future__ import absolute_import, division, print_function
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+timer = getattr(time, 'perf_counter', time.time)
+maxSpans = 100000
+
+enabled = os.environ.get('COORDUI_PROFILE', '') not in ('', '0')
+_spans = deque(maxlen=maxSpans)
+# name : [count, total, max]
+_stats = {}
+_lock = threading.Lock()
+_origin = timer()
+
+
+# ---------------------------------------------------------
+# span (records duration on exit)
+# ---------------------------------------------------------
+class Span(object):
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = timer()
+        return self
+
+    def __exit__(self, *args):
+        record(self.name, self.start, timer() - self.start)
+
+
+# ---------------------------------------------------------
+# disabled span
+# ---------------------------------------------------------
+class NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_nullSpan = NullSpan()
+
+
+# ---------------------------------------------------------
+# enable / disable
+# ---------------------------------------------------------
+# @param <bool>flag : enable
+# @return None
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+
+def disable():
+    enable(False)
+
+
+# ---------------------------------------------------------
+# get span context
+# ---------------------------------------------------------
+# @param <str>name : stage name
+# @return <Span/NullSpan>span : context manager
+def span(name):
+    if not enabled:
+        return _nullSpan
+    return Span(name)
+
+
+# ---------------------------------------------------------
+# decorator timing function
+# ---------------------------------------------------------
+# @param <str>name : stage name
+# @return <func>decorator : decorator
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kw):
+            if not enabled:
+                return func(*args, **kw)
+            with Span(name):
+                return func(*args, **kw)
+        return wrapper
+    return decorator
+
+
+# ---------------------------------------------------------
+# record span
+# ---------------------------------------------------------
+# @param <str>name      : stage name
+# @param <float>start   : start time (sec)
+# @param <float>elapsed : duration (sec)
+# @return None
+def record(name, start, elapsed):
+    _spans.append((name, start, elapsed, threading.current_thread().ident))
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            _stats[name] = [1, elapsed, elapsed]
+        else:
+            stat[0] += 1
+            stat[1] += elapsed
+            if elapsed > stat[2]:
+                stat[2] = elapsed
+
+
+# ---------------------------------------------------------
+# clear records
+# ---------------------------------------------------------
+# @param None
+# @return None
+def reset():
+    with _lock:
+        _spans.clear()
+        _stats.clear()
+
+
+# ---------------------------------------------------------
+# get statistics
+# ---------------------------------------------------------
+# @param None
+# @return <dict>stats : {name : {count, totalMs, meanMs, maxMs}}
+def getStats():
+    with _lock:
+        items = [(k, list(v)) for k, v in _stats.items()]
+    result = {}
+    for name, (count, total, maxval) in items:
+        result[name] = {'count': count,
+                        'totalMs': total * 1000.0,
+                        'meanMs': total / count * 1000.0,
+                        'maxMs': maxval * 1000.0}
+    return result
+
+
+# ---------------------------------------------------------
+# get statistics summary text
+# ---------------------------------------------------------
+# @param None
+# @return <str>text : summary
+def summary():
+    lines = ['%-24s %8s %12s %10s %10s' % ('stage', 'count', 'total(ms)', 'mean(ms)', 'max(ms)')]
+    stats = getStats()
+    for name in sorted(stats, key=lambda k: -stats[k]['totalMs']):
+        stat = stats[name]
+        lines.append('%-24s %8d %12.2f %10.3f %10.3f' % (name, stat['count'], stat['totalMs'],
+                                                       stat['meanMs'], stat['maxMs']))
+    return '\n'.join(lines)
+
+
+def printSummary():
+    print(summary())
+
+
+# ---------------------------------------------------------
+# dump trace (chrome://tracing format)
+# ---------------------------------------------------------
+# @param <str>path : output path
+# @return <int>count : span count
+def dumpTrace(path):
+    pid = os.getpid()
+    eventList = []
+    for name, start, elapsed, tid in list(_spans):
+        eventList.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                          'ts': (start - _origin) * 1e6, 'dur': elapsed * 1e6})
+    f = open(path, 'w')
+    with f:
+        json.dump({'traceEvents': eventList, 'displayTimeUnit': 'ms'}, f)
+    return len(eventList)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  level of detail image pyramid
+#  @file   pyramid.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+from PySide2 import QtCore
+
+from . import loader
+
+
+# level (ratio to base thumbnail size)
+levels = [0.25, 0.5, 1.0, 2.0, 4.0]
+
+
+# ---------------------------------------------------------
+# choose level from view scale
+# ---------------------------------------------------------
+# @param <float>scale       : view scale
+# @param <float/List>levelList : level list
+# @return <float>level : smallest level not less than scale
+def chooseLevel(scale, levelList=levels):
+    levelList = sorted(levelList)
+    for level in levelList:
+        if level >= scale:
+            return level
+    return levelList[-1]
+
+
+# ---------------------------------------------------------
+# get target size of level
+# ---------------------------------------------------------
+# @param <int/List>wh  : base width and height
+# @param <float>level  : level
+# @return <int/List>size : width and height
+def levelSize(wh, level):
+    return [max(1, int(round(wh[0] * level))), max(1, int(round(wh[1] * level)))]
+
+
+# ---------------------------------------------------------
+# get trim of level (for decoding upper level from source)
+# ---------------------------------------------------------
+# @param <tuple>trim  : (source rect, scaled rect, scaled size) of base (None : full image)
+# @param <float>level : level
+# @return <tuple>trim : trim of level (None : full image)
+def levelTrim(trim, level):
+    if trim is None:
+        return None
+    x, y, w, h = trim[1]
+    rect = (x * level, y * level, max(1, int(w * level + 0.5)), max(1, int(h * level + 0.5)))
+    return (trim[0], rect, tuple(levelSize(trim[2], level)))
+
+
+# ---------------------------------------------------------
+# build lower level pixmap (downscale base, no decoding)
+# ---------------------------------------------------------
+# @param <QtGui.QPixmap>base      : base (level 1.0) pixmap
+# @param <int/List>wh             : base width and height
+# @param <float>level             : level (less than 1.0)
+# @param <tuple>trim              : trim of base (None : full image)
+# @return <QtGui.QPixmap>pixmap : level pixmap
+def buildLevel(base, wh, level, trim=None):
+    smooth = QtCore.Qt.SmoothTransformation
+    if trim is not None:
+        size = levelSize(trim[1][2:], level)
+        return base.scaled(size[0], size[1], QtCore.Qt.IgnoreAspectRatio, smooth)
+    return loader.scaleToFit(base, levelSize(wh, level), smooth)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# #########################################################
+#
+#  @brief  thumbnail directory watcher
+#  @file   watcher.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2019 Satoshi Gonokami.
+#
+# #########################################################
+from __future__ import absolute_import, division
+
+from PySide2 import QtCore
+
+from . import catalog
+
+
+# ---------------------------------------------------------
+# make directory signature from listing
+# ---------------------------------------------------------
+# @param <tuple/List>entryList : (name, path, mtime)
+# @return <frozenset>signature : (name, mtime) set
+def makeSignature(entryList):
+    return frozenset((name, mtime) for name, path, mtime in entryList)
+
+
+# ---------------------------------------------------------
+# get directory signature (changed if file is added, removed or modified)
+# ---------------------------------------------------------
+# @param <str>directory : directory
+# @return <frozenset>signature : (name, mtime) set
+def getSignature(directory):
+    return makeSignature(catalog.listEntries(directory))
+
+
+# ---------------------------------------------------------
+# directory watcher (QFileSystemWatcher with slow polling)
+# ---------------------------------------------------------
+class DirectoryWatcher(QtCore.QObject):
+    # emitted once per burst of file events
+    changed = QtCore.Signal()
+    # max watched file count (file handles are used on some platforms)
+    maxWatchedFiles = 1000
+
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <str>directory    : watched directory
+    # @param <int>interval     : polling interval (msec)
+    # @param <int>delay        : wait for burst of events (msec)
+    # @param <bool>usePolling  : use polling instead of file system events
+    # @param <int>slowInterval : polling interval with file system events (msec)
+    # @param <obj>parent       : parent
+    # @return None
+    def __init__(self, directory, interval=2000, delay=300, usePolling=False,
+                 slowInterval=10000, parent=None):
+        super(DirectoryWatcher, self).__init__(parent)
+        self.directory = directory
+        self.signature = None
+        # last listing (name, path, mtime)
+        self.entryList = []
+        self.delayTimer = QtCore.QTimer(self)
+        self.delayTimer.setSingleShot(True)
+        self.delayTimer.setInterval(delay)
+        self.delayTimer.timeout.connect(self.check)
+        self.pollTimer = QtCore.QTimer(self)
+        self.pollTimer.setInterval(interval)
+        self.pollTimer.timeout.connect(self.check)
+        self.fsWatcher = None
+        if not usePolling:
+            self.fsWatcher = QtCore.QFileSystemWatcher(self)
+            if self.fsWatcher.addPath(directory):
+                # overwritten file does not change directory
+                self.fsWatcher.directoryChanged.connect(self.onDirectoryChanged)
+                self.fsWatcher.fileChanged.connect(self.onDirectoryChanged)
+                # events are often missed on network share
+                self.pollTimer.setInterval(max(interval, slowInterval))
+            else:
+                self.fsWatcher = None
+
+    # ---------------------------------------------------------
+    # check watching by polling only
+    # ---------------------------------------------------------
+    # @param None
+    # @return <bool> : if polling only, True
+    def isPolling(self):
+        return self.fsWatcher is None
+
+    # ---------------------------------------------------------
+    # start watching
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def start(self):
+        self.entryList = catalog.listEntries(self.directory)
+        self.signature = makeSignature(self.entryList)
+        self.watchFiles()
+        self.pollTimer.start()
+
+    # ---------------------------------------------------------
+    # stop watching
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def stop(self):
+        self.pollTimer.stop()
+        self.delayTimer.stop()
+        if self.fsWatcher is not None:
+            paths = self.fsWatcher.directories() + self.fsWatcher.files()
+            if paths:
+                self.fsWatcher.removePaths(paths)
+            self.fsWatcher = None
+
+    # ---------------------------------------------------------
+    # watch files of last listing (replaced file is watched again)
+    # ---------------------------------------------------------
+    # @param None
+    # @return None
+    def watchFiles(self):
+        if self.fsWatcher is None:
+            return
+        pathSet = set(path for name, path, mtime in self.entryList[:self.maxWatchedFiles])
+        watchedSet = set(self.fsWatcher.files())
+        removed = list(watchedSet - pathSet)
+        added = list(pathSet - watchedSet)
+        if removed:
+            self.fsWatcher.removePaths(removed)
+        if added:
+            self.fsWatcher.addPaths(added)
+
+    # ---------------------------------------------------------
+    # directory or file changed event
+    # ---------------------------------------------------------
+    # @param <str>path : directory or file
+    # @return None
+    def onDirectoryChanged(self, path):
+        self.delayTimer.start()
+
+    # ---------------------------------------------------------
+    # compare directory signature and notify
+    # ---------------------------------------------------------
+    # @param None
+    # @return <bool> : if changed, True
+    def check(self):
+        entryList = catalog.listEntries(self.directory)
+        signature = makeSignature(entryList)
+        if signature == self.signature:
+            return False
+        self.entryList = entryList
+        self.signature = signature
+        self.watchFiles()
+        self.changed.emit()
+        return True
@@ -16,7 +16,9 @@ echo.
 echo ===============================================================================
 echo.
 
-%PYTHONEXE% %CURRENTDIR%\instal_mayaTool.py %toolName% "%mayaVer%"
-rem %PYTHONEXE% %CURRENTDIR%\instal_mayaTool.py %toolName% "%mayaVer%" %toolCmd%
+rem install to all maya versions found in user profile (--versions 2018,2020 / --profiles "C:/Users/*")
+%PYTHONEXE% %CURRENTDIR%\install_mayaTool.py --all %toolName%
+rem %PYTHONEXE% %CURRENTDIR%\install_mayaTool.py %toolName% "%mayaVer%"
+rem %PYTHONEXE% %CURRENTDIR%\install_mayaTool.py %toolName% "%mayaVer%" %toolCmd%
 p4 sync -f %toolDir%
 pause
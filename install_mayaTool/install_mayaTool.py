@@ -17,13 +17,43 @@ import os
 import sys
 import shutil
 import glob
+import json
+import re
+import threading
+import argparse
+from multiprocessing.pool import ThreadPool
+
+try:
+    from . import shelf_parser
+except (ImportError, ValueError):
+    # run as script or imported as top level module
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import shelf_parser
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 
 scriptDir = os.path.abspath(os.path.dirname(__file__)).replace('\\', '/')
 projDir = os.path.abspath(os.path.join(scriptDir, u"../../../../..")).replace('\\', '/')
 projName = 'projName'
-shelfDir = os.environ['USERPROFILE'].replace('\\', '/') + '/Documents/maya/[mayaVer]/prefs/shelves'
+profileDir = os.environ['USERPROFILE'].replace('\\', '/')
+mayaPrefDir = '/Documents/maya/[mayaVer]/prefs'
+shelfDir = profileDir + mayaPrefDir + '/shelves'
+mayaVerRe = re.compile(r'^\d{4}(\.\d+)?(-x64)?$')
 shelfMelFile = 'shelf_' + projName + '.mel'
-toolGUICmd = 'import [toolName].gui as [toolName]ui;reload([toolName]ui)\\n'
+iconIndexFile = scriptDir + '/icon_index.json'
+iconSuffix = '_icon.png'
+iconDepth = 6
+iconIndex = None
+shelfIndexFile = scriptDir + '/shelf_index.json'
+shelfIndexVersion = 1
+shelfIndex = None
+shelfIndexLock = threading.RLock()
+toolGUICmd = 'import [toolName].gui as [toolName]ui\\n'
 toolGUICmd += '[toolName]Window = [toolName]ui.toolGUI()\\n'
 toolGUICmd += '[toolName]Window.show()'
 shelfMel = '''global proc shelf_[projName] () {
@@ -74,6 +104,110 @@ shelfBtnCmd = shelfBtnCmd.replace('\n', '\n    ')
 shelfBtnCmd = shelfBtnCmd.replace('\\n    ', '\\n')
 
 
+# ---------------------------------------------------------
+# list directory
+# ---------------------------------------------------------
+# @param <str>dirPath : directory
+# @return <tuple/List>entryList : (name, path, isDir)
+def listDir(dirPath):
+
+    entryList = []
+    try:
+        if scandir is not None:
+            for entry in scandir(dirPath):
+                entryList.append((entry.name, dirPath + '/' + entry.name, entry.is_dir()))
+        else:
+            for name in os.listdir(dirPath):
+                path = dirPath + '/' + name
+                entryList.append((name, path, os.path.isdir(path)))
+    except OSError:
+        pass
+    # same order and hidden rule as glob
+    return sorted(e for e in entryList if not e[0].startswith('.'))
+
+
+# ---------------------------------------------------------
+# build icon index (single walk, shallower icon wins)
+# ---------------------------------------------------------
+# @param <str>rootDir : root directory
+# @param <int>depth : max directory depth
+# @return <dict>index : {'dirs' : {dir : mtime}, 'icons' : {toolName : iconPath}}
+def buildIconIndex(rootDir, depth=iconDepth):
+
+    dirDict = {}
+    iconDict = {}
+    dirList = [rootDir]
+    for n in range(depth):
+        nextDirList = []
+        for dirPath in dirList:
+            try:
+                dirDict[dirPath] = os.path.getmtime(dirPath)
+            except OSError:
+                continue
+            for name, path, isDir in listDir(dirPath):
+                if isDir:
+                    nextDirList.append(path)
+                elif name.endswith(iconSuffix):
+                    iconDict.setdefault(name[:-len(iconSuffix)], path)
+        dirList = nextDirList
+
+    return {'root': rootDir, 'depth': depth, 'dirs': dirDict, 'icons': iconDict}
+
+
+# ---------------------------------------------------------
+# check icon index is up to date
+# ---------------------------------------------------------
+# @param <dict>index : icon index
+# @param <str>rootDir : root directory
+# @param <int>depth : max directory depth
+# @return <bool>result : if up to date, True
+def checkIconIndex(index, rootDir, depth=iconDepth):
+
+    if index.get('root') != rootDir or index.get('depth') != depth:
+        return False
+    for dirPath, mtime in index.get('dirs', {}).items():
+        try:
+            if os.path.getmtime(dirPath) != mtime:
+                return False
+        except OSError:
+            return False
+
+    return True
+
+
+# ---------------------------------------------------------
+# load icon index (rebuild if directory is changed)
+# ---------------------------------------------------------
+# @param <str>rootDir : root directory
+# @param <str>indexPath : index file path
+# @return <dict>index : icon index
+def loadIconIndex(rootDir=None, indexPath=None):
+
+    global iconIndex
+    rootDir = rootDir or scriptDir
+    indexPath = indexPath or iconIndexFile
+    if iconIndex is not None and iconIndex.get('root') == rootDir:
+        return iconIndex
+    index = None
+    try:
+        f = open(indexPath, 'r')
+        with f:
+            index = json.load(f)
+    except (IOError, OSError, ValueError):
+        pass
+    if index is None or not checkIconIndex(index, rootDir):
+        index = buildIconIndex(rootDir)
+        try:
+            f = open(indexPath, 'w')
+            with f:
+                json.dump(index, f)
+        except (IOError, OSError):
+            print("# cannot save icon index : '" + indexPath + "' #")
+    iconIndex = index
+
+    return iconIndex
+
+
 # ---------------------------------------------------------
 # get icon path
 # ---------------------------------------------------------
@@ -81,37 +215,149 @@ shelfBtnCmd = shelfBtnCmd.replace('\\n    ', '\\n')
 # @return <str>iconPath : icon path
 def getIconPath(toolName):
 
-    iconPath = None
-    for n in range(6):
-        iconGrobPath = scriptDir + '/' + '*/' * n + toolName + '_icon.png'
-        tmpIconPath = glob.glob(iconGrobPath)
-        if tmpIconPath:
-            iconPath = tmpIconPath[0].replace('\\', '/')
-            break
+    iconPath = loadIconIndex()['icons'].get(toolName)
     if not iconPath:
         iconPath = 'pythonFamily.png'
 
     return iconPath
 
 
+# ---------------------------------------------------------
+# get shelf directory
+# ---------------------------------------------------------
+# @param <str>mayaVer : maya version
+# @param <str>profile : user profile root (None : current user)
+# @return <str>shelfPathDir : shelf directory
+def getShelfDir(mayaVer, profile=None):
+
+    if profile is None:
+        return shelfDir.replace('[mayaVer]', mayaVer)
+    return profile.replace('\\', '/') + mayaPrefDir.replace('[mayaVer]', mayaVer) + '/shelves'
+
+
+# ---------------------------------------------------------
+# find maya versions in user profile
+# ---------------------------------------------------------
+# @param <str>profile : user profile root (None : current user)
+# @return <str/List>versionList : maya versions (folder has prefs)
+def findMayaVersions(profile=None):
+
+    mayaDir = (profile or profileDir).replace('\\', '/') + '/Documents/maya'
+    versionList = []
+    for name, path, isDir in listDir(mayaDir):
+        if isDir and mayaVerRe.match(name) and os.path.isdir(path + '/prefs'):
+            versionList.append(name)
+
+    return versionList
+
+
+# ---------------------------------------------------------
+# load shelf index
+# ---------------------------------------------------------
+# @param <str>indexPath : index file path
+# @return <dict>index : {shelf path : {'mtime', 'size', 'buttons' : [[label, annotation]]}}
+def loadShelfIndex(indexPath=None):
+
+    global shelfIndex
+    with shelfIndexLock:
+        if shelfIndex is None:
+            shelfIndex = {}
+            try:
+                f = open(indexPath or shelfIndexFile, 'r')
+                with f:
+                    data = json.load(f)
+                if data.get('version') == shelfIndexVersion:
+                    shelfIndex = data['shelves']
+            except (IOError, OSError, ValueError, KeyError):
+                pass
+
+    return shelfIndex
+
+
+# ---------------------------------------------------------
+# save shelf index
+# ---------------------------------------------------------
+# @param <str>indexPath : index file path
+# @return None
+def saveShelfIndex(indexPath=None):
+
+    indexPath = indexPath or shelfIndexFile
+    with shelfIndexLock:
+        try:
+            f = open(indexPath, 'w')
+            with f:
+                json.dump({'version': shelfIndexVersion, 'shelves': loadShelfIndex()}, f)
+        except (IOError, OSError):
+            print("# cannot save shelf index : '" + indexPath + "' #")
+
+
+# ---------------------------------------------------------
+# update shelf index of shelf dir (changed files only)
+# ---------------------------------------------------------
+# @param <str>mayaVer : maya version
+# @param <str>profile : user profile root (None : current user)
+# @return <dict>toolDict : {label or annotation : [(shelf path, button position)]}
+def updateShelfIndex(mayaVer, profile=None):
+
+    shelfPathDir = getShelfDir(mayaVer, profile)
+    shelfPathList = [p.replace('\\', '/') for p in glob.glob(shelfPathDir + '/shelf_*.mel')]
+    index = loadShelfIndex()
+    changed = False
+    toolDict = {}
+    for shmel in shelfPathList:
+        try:
+            stat = os.stat(shmel)
+        except OSError:
+            continue
+        with shelfIndexLock:
+            entry = index.get(shmel)
+        if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+            shelf = shelf_parser.readShelf(shmel)
+            entry = {'mtime': stat.st_mtime, 'size': stat.st_size,
+                     'buttons': [button.getNames() for button in shelf.buttons]}
+            with shelfIndexLock:
+                index[shmel] = entry
+            changed = True
+        for n, names in enumerate(entry['buttons']):
+            for name in set(names):
+                toolDict.setdefault(name, []).append((shmel, n))
+    # removed shelves
+    with shelfIndexLock:
+        for shmel in [p for p in index if os.path.dirname(p) == shelfPathDir]:
+            if shmel not in shelfPathList:
+                del index[shmel]
+                changed = True
+    if changed:
+        saveShelfIndex()
+
+    return toolDict
+
+
+# ---------------------------------------------------------
+# find tool in shelves
+# ---------------------------------------------------------
+# @param <str>toolName : tool name
+# @param <str>mayaVer : maya version
+# @param <str>profile : user profile root (None : current user)
+# @return <tuple/List>posList : (shelf path, button position)
+def findTool(toolName, mayaVer, profile=None):
+
+    return updateShelfIndex(mayaVer, profile).get(toolName, [])
+
+
 # ---------------------------------------------------------
 # check shelf
 # ---------------------------------------------------------
 # @param <str>toolName : tool name
 # @param <str>mayaVer : maya version
+# @param <dict>toolDict : shelf index (None : update from shelf dir)
 # @return <bool>result : if exist tool, True
-def checkShelf(toolName, mayaVer):
-
-    global shelfDir
-    result = False
-    shelfPath = shelfDir.replace('[mayaVer]', mayaVer) + '/shelf_*.mel'
-    shelfMelList = glob.glob(shelfPath)
-    for shmel in shelfMelList:
-        f = open(shmel, 'r')
-        with f:
-            shelfStr = f.read()
-        if '"' + toolName + '"' in shelfStr:
-            result = True
+def checkShelf(toolName, mayaVer, toolDict=None):
+
+    if toolDict is None:
+        result = bool(findTool(toolName, mayaVer))
+    else:
+        result = toolName in toolDict
 
     return result
 
@@ -152,23 +398,13 @@ def makeShortName(toolName):
 
 
 # ---------------------------------------------------------
-# make shelf command
+# make shelf button command
 # ---------------------------------------------------------
 # @param <str>toolName : tool name
-# @param <str>mayaVer : maya version
 # @param <str>cmdOwrite : set tool command
-# @return <str>shelfStr : shelf mel string
-def makeShelfCmd(toolName, mayaVer, cmdOwrite=None):
+# @return <str>toolBtnCmd : shelf button mel string
+def makeBtnCmd(toolName, cmdOwrite=None):
 
-    global scriptDir
-    global shelfDir
-    global shelfMel
-    global shelfBtnCmd
-    global shelfMelFile
-    global toolGUICmd
-
-    # make tool Button command
-    shelfPath = shelfDir.replace('[mayaVer]', mayaVer) + '/' + shelfMelFile
     if cmdOwrite is None:
         toolCmd = toolGUICmd.replace('[toolName]', toolName)
     else:
@@ -185,49 +421,241 @@ def makeShelfCmd(toolName, mayaVer, cmdOwrite=None):
     toolBtnCmd = toolBtnCmd.replace('[icon]', iconPath)
     toolBtnCmd = toolBtnCmd.replace('[toolCmd]', toolCmd)
 
+    return toolBtnCmd
+
+
+# ---------------------------------------------------------
+# make shelf command
+# ---------------------------------------------------------
+# @param <str>toolName : tool name
+# @param <str>mayaVer : maya version
+# @param <str>cmdOwrite : set tool command
+# @return <str>shelfStr : shelf mel string
+def makeShelfCmd(toolName, mayaVer, cmdOwrite=None):
+
+    return makeBatchShelfCmd([(toolName, cmdOwrite)], mayaVer).toString()
+
+
+# ---------------------------------------------------------
+# make shelf command of tools (shelf is read once)
+# ---------------------------------------------------------
+# @param <tuple/List>toolList : (toolName, cmdOwrite)
+# @param <str>mayaVer : maya version
+# @param <str>profile : user profile root (None : current user)
+# @return <shelf_parser.Shelf>shelf : shelf
+def makeBatchShelfCmd(toolList, mayaVer, profile=None):
+
+    shelfPath = getShelfDir(mayaVer, profile) + '/' + shelfMelFile
     if os.path.exists(shelfPath):
-        f = open(shelfPath, 'r')
-        with f:
-            shelfLines = f.readlines()
-        shelfBtnCmdTemp = ''
-        remFlg = False
-        for sline in shelfLines:
-            if 'shelfButton' in sline:
-                shelfBtnCmdTemp += sline
-                remFlg = True
-            elif (remFlg is True and
-                  len(sline.replace('\n', '').replace('\r', '')) > 0 and
-                  '}' in sline.replace('\n', '').replace('\r', '')[-2:]):
-                remFlg = False
-            elif remFlg is True:
-                shelfBtnCmdTemp += sline
-        if not '"' + toolName + '"' in shelfBtnCmdTemp:
-            toolBtnCmd = shelfBtnCmdTemp + toolBtnCmd
-    shelfStr = shelfMel.replace('[shelfBtnCmd]', toolBtnCmd)
-
-    return shelfStr
+        shelf = shelf_parser.readShelf(shelfPath)
+    else:
+        shelf = shelf_parser.parseShelf(shelfMel.replace('[shelfBtnCmd]', ''))
+    # add new buttons after existing buttons (others are kept as they are)
+    for toolName, cmdOwrite in toolList:
+        if shelf.findButton(toolName) is None:
+            shelf.addButton(shelf_parser.parseButton(makeBtnCmd(toolName, cmdOwrite)))
+
+    return shelf
 
 
 # ---------------------------------------------------------
 # make shelf
 # ---------------------------------------------------------
-# @param <str>shelfStr : shelf mel string
+# @param <str/shelf_parser.Shelf>shelfStr : shelf mel string or shelf
 # @param <str>mayaVer : maya version
+# @param <str>profile : user profile root (None : current user)
+# @param <bool>verbose : print backup path
 # @return None
-def makeShelf(shelfStr, mayaVer):
-    shelfPath = shelfDir.replace('[mayaVer]', mayaVer) + '/' + shelfMelFile
+def makeShelf(shelfStr, mayaVer, profile=None, verbose=True):
+    shelfPathDir = getShelfDir(mayaVer, profile)
+    shelfPath = shelfPathDir + '/' + shelfMelFile
+    if not os.path.isdir(shelfPathDir):
+        os.makedirs(shelfPathDir)
     # back up
     if os.path.exists(shelfPath):
         backupPath = shelfPath.replace('.mel', '.mel.backup')
         if os.path.exists(backupPath):
             os.remove(backupPath)
         shutil.move(shelfPath, backupPath)
-        print("# backup : '" + backupPath + "' #")
+        if verbose:
+            print("# backup : '" + backupPath + "' #")
 
-    # main
-    f = open(shelfPath, 'w')
+    # main (written with one text type)
+    if not isinstance(shelfStr, shelf_parser.Shelf):
+        shelfStr = shelf_parser.parseShelf(shelfStr)
+    shelf_parser.writeShelf(shelfPath, shelfStr)
+
+
+# ---------------------------------------------------------
+# load tool list
+# ---------------------------------------------------------
+# @param <str>toolListArg : tool list file (json or text) or comma separated tool names
+# @return <tuple/List>toolList : (toolName, cmdOwrite)
+def loadToolList(toolListArg):
+
+    toolList = []
+    if not os.path.isfile(toolListArg):
+        for toolName in toolListArg.split(','):
+            if toolName.strip():
+                toolList.append((toolName.strip(), None))
+        return toolList
+    f = open(toolListArg, 'r')
     with f:
-        f.write(shelfStr)
+        toolStr = f.read()
+    # json : ["toolName", {"name" : "toolName", "command" : "..."}]
+    if toolListArg.endswith('.json'):
+        for tool in json.loads(toolStr):
+            if isinstance(tool, dict):
+                toolList.append((tool['name'], tool.get('command')))
+            else:
+                toolList.append((tool, None))
+        return toolList
+    # text : toolName[<tab>command] per line
+    for line in toolStr.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        lineSplit = line.split('\t', 1)
+        if len(lineSplit) > 1:
+            toolList.append((lineSplit[0].strip(), lineSplit[1].strip()))
+        else:
+            toolList.append((lineSplit[0], None))
+
+    return toolList
+
+
+# ---------------------------------------------------------
+# install tools (read and write shelf once)
+# ---------------------------------------------------------
+# @param <tuple/List>toolList : (toolName, cmdOwrite)
+# @param <str>mayaVer : maya version
+# @param <str>profile : user profile root (None : current user)
+# @param <bool>verbose : print installed tools
+# @return <str/List>installList : installed tool names
+def installTools(toolList, mayaVer, profile=None, verbose=True):
+
+    toolDict = updateShelfIndex(mayaVer, profile)
+    newToolList = []
+    for toolName, cmdOwrite in toolList:
+        if toolName in [t[0] for t in newToolList]:
+            continue
+        if checkShelf(toolName, mayaVer, toolDict) is False:
+            newToolList.append((toolName, cmdOwrite))
+    if newToolList:
+        shelf = makeBatchShelfCmd(newToolList, mayaVer, profile)
+        makeShelf(shelf, mayaVer, profile, verbose)
+        if verbose:
+            print("# install : " + ', '.join(t[0] for t in newToolList) + " #")
+
+    return [t[0] for t in newToolList]
+
+
+# ---------------------------------------------------------
+# install tools to one target (for thread pool)
+# ---------------------------------------------------------
+# @param <tuple>args : (toolList, profile, mayaVer)
+# @return <dict>result : {'profile', 'mayaVer', 'installed', 'skip', 'error'}
+def installTarget(args):
+
+    toolList, profile, mayaVer = args
+    result = {'profile': profile, 'mayaVer': mayaVer, 'installed': [], 'skip': None,
+              'error': None}
+    try:
+        # messages of worker threads are reported by printReport
+        result['installed'] = installTools(toolList, mayaVer, profile, False)
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+
+    return result
+
+
+# ---------------------------------------------------------
+# install tools to all maya versions and profiles (parallel)
+# ---------------------------------------------------------
+# @param <tuple/List>toolList : (toolName, cmdOwrite)
+# @param <str/List>profileList : user profile roots (glob pattern ok, None : current user)
+# @param <str/List>versionList : maya versions (None : all, limited to found in each profile)
+# @param <int>workers : thread count
+# @return <dict/List>resultList : per target result
+def installAll(toolList, profileList=None, versionList=None, workers=8):
+
+    profiles = []
+    for profile in profileList or [profileDir]:
+        for path in sorted(glob.glob(profile)) or [profile]:
+            path = path.replace('\\', '/')
+            if path not in profiles:
+                profiles.append(path)
+    targetList = []
+    skipList = []
+    for profile in profiles:
+        foundList = findMayaVersions(profile)
+        for mayaVer in versionList or foundList:
+            if mayaVer in foundList:
+                targetList.append((toolList, profile, mayaVer))
+            else:
+                # maya version never run by user
+                skipList.append({'profile': profile, 'mayaVer': mayaVer, 'installed': [],
+                                 'skip': 'no prefs folder', 'error': None})
+    if not targetList:
+        return skipList
+    # share icon index and shelf index between threads
+    loadIconIndex()
+    loadShelfIndex()
+    pool = ThreadPool(max(1, min(workers, len(targetList))))
+    try:
+        resultList = pool.map(installTarget, targetList)
+    finally:
+        pool.close()
+        pool.join()
+    resultList = sorted(resultList + skipList, key=lambda r: (r['profile'], r['mayaVer']))
+
+    return resultList
+
+
+# ---------------------------------------------------------
+# print install report
+# ---------------------------------------------------------
+# @param <dict/List>resultList : per target result
+# @return <int>errorCount : failed target count
+def printReport(resultList):
+
+    errorCount = 0
+    print("# install report (%d target) #" % len(resultList))
+    for result in resultList:
+        target = result['profile'] + ' [' + result['mayaVer'] + ']'
+        if result['error']:
+            errorCount += 1
+            print("  NG   " + target + " : " + result['error'])
+        elif result['installed']:
+            print("  OK   " + target + " : " + ', '.join(result['installed']))
+        elif result['skip']:
+            print("  SKIP " + target + " : " + result['skip'])
+        else:
+            print("  SKIP " + target + " : already installed")
+
+    return errorCount
+
+
+# ---------------------------------------------------------
+# main (all maya versions and profiles)
+# ---------------------------------------------------------
+# @param <str/List>argv : arguments
+# @return <int>errorCount : failed target count
+def mainAll(argv):
+    parser = argparse.ArgumentParser(prog='install_mayaTool.py --all')
+    parser.add_argument('tools', help='tool list file (json or text) or tool1,tool2')
+    parser.add_argument('--versions', default='',
+                        help='maya versions (2018,2020 / default : found in profile)')
+    parser.add_argument('--profiles', default='',
+                        help='user profile roots separated by ; (glob pattern ok)')
+    parser.add_argument('--workers', type=int, default=8, help='thread count')
+    args = parser.parse_args(argv)
+    versionList = [v for v in args.versions.split(',') if v]
+    profileList = [p for p in args.profiles.split(';') if p]
+    resultList = installAll(loadToolList(args.tools), profileList or None, versionList or None,
+                            args.workers)
+
+    return printReport(resultList)
 
 
 # ---------------------------------------------------------
@@ -238,16 +666,18 @@ def makeShelf(shelfStr, mayaVer):
 # @param <str>cmdOwrite : set tool command
 # @return None
 def main(toolName, mayaVer, cmdOwrite=None):
-    # check shelf
-    if checkShelf(toolName, mayaVer) is False:
-        # make shelf
-        shelfStr = makeShelfCmd(toolName, mayaVer, cmdOwrite)
-        makeShelf(shelfStr, mayaVer)
+    installTools([(toolName, cmdOwrite)], mayaVer)
 
 
 # ----------------------------------------------------------------------------
 if __name__ == '__main__':
-    if len(sys.argv) > 3:
+    # install_mayaTool.py --batch <toolList file or tool1,tool2> <mayaVer>
+    # install_mayaTool.py --all <toolList file or tool1,tool2> [--versions] [--profiles]
+    if sys.argv[1] == '--batch':
+        installTools(loadToolList(sys.argv[2]), sys.argv[3])
+    elif sys.argv[1] == '--all':
+        sys.exit(1 if mainAll(sys.argv[2:]) else 0)
+    elif len(sys.argv) > 3:
         main(sys.argv[1], sys.argv[2], sys.argv[3])
     else:
         main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+##########################################################
+#
+#  @brief  MEL shelf parser / writer
+#  @file   shelf_parser.py
+#  @author Satoshi Gonokami
+#
+#  Copyright(C) 2018 Satoshi Gonokami.
+#
+#  [note]\n
+#  shelf text is kept as segments (raw text or shelfButton).\n
+#  untouched segments are written back as they were read.\n
+#
+##########################################################
+from __future__ import absolute_import, division, print_function
+import io
+import os
+import re
+import sys
+
+# python2
+try:
+    textTypes = (str, unicode)
+except NameError:
+    textTypes = (str,)
+
+# byte string (python2 str)
+bytesType = type(b'')
+
+# whitespace / comment / string / word / punctuation
+tokenRe = re.compile(r'(?P<ws>\s+)'
+                     r'|(?P<comment>//[^\n]*|/\*.*?(?:\*/|$))'
+                     r'|(?P<string>"(?:[^"\\]|\\.)*"?)'
+                     r'|(?P<word>[^\s;{}()"]+)'
+                     r'|(?P<punct>.)', re.S)
+flagRe = re.compile(r'-[A-Za-z]')
+escapeDict = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+unescapeDict = dict((v, '\\' + k) for k, v in escapeDict.items())
+
+
+# ---------------------------------------------------------
+# convert byte string to text (python2 str is mixed with decoded shelf)
+# ---------------------------------------------------------
+# @param <str>value : value
+# @return <unicode>text : text (others are returned as they are)
+def toText(value):
+
+    if not isinstance(value, bytesType):
+        return value
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return value.decode(sys.getfilesystemencoding() or 'latin-1')
+
+
+# ---------------------------------------------------------
+# tokenize mel text
+# ---------------------------------------------------------
+# @param <str>text : mel text
+# @return <generator>tokens : (kind, text)
+def tokenize(text):
+
+    for match in tokenRe.finditer(text):
+        yield match.lastgroup, match.group()
+
+
+# ---------------------------------------------------------
+# decode mel string literal
+# ---------------------------------------------------------
+# @param <str>literal : string literal ("...")
+# @return <str>value : value
+def decodeString(literal):
+
+    body = literal[1:-1] if literal.endswith('"') and len(literal) > 1 else literal[1:]
+    return re.sub(r'\\(.)', lambda m: escapeDict.get(m.group(1), m.group(1)), body, flags=re.S)
+
+
+# ---------------------------------------------------------
+# encode mel string literal
+# ---------------------------------------------------------
+# @param <str>value : value
+# @return <str>literal : string literal ("...")
+def encodeString(value):
+
+    return '"' + ''.join(unescapeDict.get(c, c) for c in value) + '"'
+
+
+# ---------------------------------------------------------
+# shelf button
+# ---------------------------------------------------------
+class ShelfButton(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <str>text : source text ('shelfButton' to ';')
+    # @param <str>prefix : whitespace before button
+    # @param <List>flags : [flag name, [(isString, value)]]
+    # @return None
+    def __init__(self, text, prefix='', flags=None):
+        self.text = text
+        self.prefix = prefix
+        self.flags = flags or []
+        self.dirty = False
+
+    # ---------------------------------------------------------
+    # get flag values
+    # ---------------------------------------------------------
+    # @param <str>name : flag name (without '-')
+    # @return <str/List>values : values (None if not set)
+    def getFlag(self, name):
+
+        for flagName, values in self.flags:
+            if flagName == name:
+                return [v for isString, v in values]
+        return None
+
+    # ---------------------------------------------------------
+    # get first flag value
+    # ---------------------------------------------------------
+    # @param <str>name : flag name (without '-')
+    # @param <str>default : return value if not set
+    # @return <str>value : value
+    def getValue(self, name, default=None):
+
+        values = self.getFlag(name)
+        if not values:
+            return default
+        return values[0]
+
+    # ---------------------------------------------------------
+    # set flag values (str is written as string literal)
+    # ---------------------------------------------------------
+    # @param <str>name : flag name (without '-')
+    # @param <obj>values : values
+    # @return None
+    def setFlag(self, name, *values):
+
+        valueList = [(isinstance(v, textTypes), toText(v) if isinstance(v, textTypes) else str(v))
+                     for v in values]
+        for flag in self.flags:
+            if flag[0] == name:
+                flag[1] = valueList
+                break
+        else:
+            self.flags.append([name, valueList])
+        self.dirty = True
+
+    # ---------------------------------------------------------
+    # get label and annotation
+    # ---------------------------------------------------------
+    # @param None
+    # @return <str/List>names : label and annotation
+    def getNames(self):
+
+        return [v for v in [self.getValue('label'), self.getValue('annotation')] if v]
+
+    # ---------------------------------------------------------
+    # to mel text (untouched button returns source text)
+    # ---------------------------------------------------------
+    # @param None
+    # @return <str>text : mel text
+    def toString(self):
+
+        if not self.dirty:
+            return self.prefix + self.text
+        indent = self.prefix.split('\n')[-1]
+        lines = ['shelfButton']
+        for name, values in self.flags:
+            valueStr = ' '.join(encodeString(v) if isString else v for isString, v in values)
+            lines.append(indent + '    -' + name + (' ' + valueStr if valueStr else ''))
+        lines.append(indent + ';')
+        return self.prefix + '\n'.join(lines)
+
+
+# ---------------------------------------------------------
+# shelf
+# ---------------------------------------------------------
+class Shelf(object):
+    # ---------------------------------------------------------
+    # init
+    # ---------------------------------------------------------
+    # @param <List>segments : raw text (str) or ShelfButton
+    # @param <str>encoding : file encoding
+    # @return None
+    def __init__(self, segments=None, encoding='utf-8'):
+        self.segments = segments or []
+        self.encoding = encoding
+
+    # ---------------------------------------------------------
+    # get buttons
+    # ---------------------------------------------------------
+    # @param None
+    # @return <ShelfButton/List>buttons : buttons
+    @property
+    def buttons(self):
+        return [s for s in self.segments if isinstance(s, ShelfButton)]
+
+    # ---------------------------------------------------------
+    # find button by label or annotation
+    # ---------------------------------------------------------
+    # @param <str>name : label or annotation
+    # @return <ShelfButton>button : button (None if not found)
+    def findButton(self, name):
+
+        for button in self.buttons:
+            if name in button.getNames():
+                return button
+        return None
+
+    # ---------------------------------------------------------
+    # add button (after last button, or before closing brace)
+    # ---------------------------------------------------------
+    # @param <ShelfButton>button : button
+    # @return <ShelfButton>button : button
+    def addButton(self, button):
+
+        index = None
+        for n, segment in enumerate(self.segments):
+            if isinstance(segment, ShelfButton):
+                index = n + 1
+        if index is None:
+            index = self.splitBeforeClose()
+        elif index < len(self.segments):
+            # keep trailing comment on line of last button
+            segment = self.segments[index]
+            lineEnd = segment.find('\n')
+            if lineEnd > 0 and segment[:lineEnd].strip():
+                self.segments[index:index + 1] = [segment[:lineEnd], segment[lineEnd:]]
+                index += 1
+        if '\n' not in button.prefix:
+            button.prefix = '\n' + button.prefix
+        self.segments.insert(index, button)
+        return button
+
+    # ---------------------------------------------------------
+    # remove button
+    # ---------------------------------------------------------
+    # @param <ShelfButton>button : button
+    # @return None
+    def removeButton(self, button):
+
+        self.segments.remove(button)
+
+    # ---------------------------------------------------------
+    # split raw segment before last closing brace
+    # ---------------------------------------------------------
+    # @param None
+    # @return <int>index : segment index of closing brace
+    def splitBeforeClose(self):
+
+        for n in reversed(range(len(self.segments))):
+            segment = self.segments[n]
+            if isinstance(segment, ShelfButton):
+                continue
+            pos = 0
+            closePos = None
+            for kind, text in tokenize(segment):
+                if kind == 'punct' and text == '}':
+                    closePos = pos
+                pos += len(text)
+            if closePos is None:
+                continue
+            # keep whitespace before brace with brace
+            head = segment[:closePos]
+            tail = segment[closePos:]
+            stripped = head.rstrip()
+            tail = head[len(stripped):] + tail
+            self.segments[n:n + 1] = [stripped, tail]
+            return n + 1
+        self.segments.append('')
+        return len(self.segments)
+
+    # ---------------------------------------------------------
+    # to mel text
+    # ---------------------------------------------------------
+    # @param None
+    # @return <str>text : mel text
+    def toString(self):
+
+        return u''.join(s.toString() if isinstance(s, ShelfButton) else s
+                        for s in self.segments)
+
+
+# ---------------------------------------------------------
+# parse shelf text (single pass)
+# ---------------------------------------------------------
+# @param <str>text : mel text
+# @return <Shelf>shelf : shelf
+def parseShelf(text):
+
+    text = toText(text)
+    segments = []
+    rawList = []
+    buttonTokens = None
+    for kind, token in tokenize(text):
+        if buttonTokens is not None:
+            buttonTokens.append((kind, token))
+            if kind == 'punct' and token == ';':
+                segments.append(makeButton(buttonTokens, prefix))
+                buttonTokens = None
+            continue
+        if kind == 'word' and token == 'shelfButton':
+            # whitespace before button belongs to button
+            prefix = ''
+            if rawList and rawList[-1][0] == 'ws':
+                prefix = rawList.pop()[1]
+            if rawList:
+                segments.append(''.join(t for k, t in rawList))
+                rawList = []
+            buttonTokens = [(kind, token)]
+            continue
+        rawList.append((kind, token))
+    if buttonTokens is not None:
+        # not terminated : keep as raw text
+        rawList = [('ws', prefix)] + buttonTokens
+    if rawList:
+        segments.append(''.join(t for k, t in rawList))
+
+    return Shelf(segments)
+
+
+# ---------------------------------------------------------
+# make button from tokens
+# ---------------------------------------------------------
+# @param <tuple/List>tokens : (kind, text) from 'shelfButton' to ';'
+# @param <str>prefix : whitespace before button
+# @return <ShelfButton>button : button
+def makeButton(tokens, prefix=''):
+
+    flags = []
+    for kind, token in tokens[1:]:
+        if kind == 'word' and flagRe.match(token):
+            flags.append([token[1:], []])
+        elif kind == 'string' and flags:
+            flags[-1][1].append((True, decodeString(token)))
+        elif kind == 'word' and flags:
+            flags[-1][1].append((False, token))
+    return ShelfButton(''.join(t for k, t in tokens), prefix, flags)
+
+
+# ---------------------------------------------------------
+# parse single button text
+# ---------------------------------------------------------
+# @param <str>text : button mel text
+# @return <ShelfButton>button : button (None if not button)
+def parseButton(text):
+
+    buttons = parseShelf(text).buttons
+    if not buttons:
+        return None
+    return buttons[0]
+
+
+# ---------------------------------------------------------
+# read shelf file
+# ---------------------------------------------------------
+# @param <str>path : shelf file path
+# @return <Shelf>shelf : shelf
+def readShelf(path):
+
+    f = open(path, 'rb')
+    with f:
+        data = f.read()
+    # decoding is reversible, so untouched text is written back byte for byte
+    try:
+        text = data.decode('utf-8')
+        encoding = 'utf-8'
+    except UnicodeDecodeError:
+        text = data.decode('latin-1')
+        encoding = 'latin-1'
+    shelf = parseShelf(text)
+    shelf.encoding = encoding
+
+    return shelf
+
+
+# ---------------------------------------------------------
+# write shelf file
+# ---------------------------------------------------------
+# @param <str>path : shelf file path
+# @param <Shelf>shelf : shelf
+# @return None
+def writeShelf(path, shelf):
+
+    text = shelf.toString()
+    if not isinstance(text, type(u'')):
+        text = text.decode(shelf.encoding)
+    tmpPath = path + '.tmp'
+    f = io.open(tmpPath, 'w', encoding=shelf.encoding, newline='')
+    with f:
+        f.write(text)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(tmpPath, path)